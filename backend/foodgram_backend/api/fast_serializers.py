@@ -0,0 +1,148 @@
+"""Read-only serializers that build response dicts without DRF fields.
+
+Every function returns exactly what its counterpart in serializers.py
+does for list actions; ``manage.py check_serializers`` compares the two.
+Related rows are read with ``values_list`` instead of model instances.
+"""
+from collections import defaultdict
+
+from recipes.images import variant_names
+from recipes.models import Recipe, RecipeIngredient, Tag, read_authors
+from users.models import Subscription
+
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit', 'amount')
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def absolute_url(request, path):
+    if request is None:
+        return path
+    return request.build_absolute_uri(path)
+
+
+def image_fields(request, name):
+    """Return the ``image`` and ``image_variants`` values of a recipe."""
+    if not name:
+        return None, None
+    variants = variant_names(name)
+    for formats in variants.values():
+        for image_format, variant in formats.items():
+            formats[image_format] = absolute_url(
+                request, image_storage.url(variant)
+            )
+    return absolute_url(request, image_storage.url(name)), variants
+
+
+def user_dict(user, is_subscribed):
+    return {
+        'email': user.email,
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_subscribed': is_subscribed
+    }
+
+
+def subscribed_authors(request, users):
+    """Return the ids of the users the requesting user is subscribed to."""
+    if request is None or request.user.is_anonymous:
+        return set()
+    if all(hasattr(user, 'is_subscribed') for user in users):
+        return {user.id for user in users if user.is_subscribed}
+    return set(Subscription.objects.filter(
+        subscriber=request.user, author__in=users
+    ).values_list('author_id', flat=True))
+
+
+def serialize_users(request, users):
+    """Same as ``UserSerializer(users, many=True).data`` for a GET."""
+    users = list(users)
+    subscribed = subscribed_authors(request, users)
+    return [user_dict(user, user.id in subscribed) for user in users]
+
+
+def serialize_recipe_fragments(request, recipes, user=None):
+    """Build ``RecipeReadSerializer`` data with the viewer's flags unset.
+
+    Returns the data by recipe id and whether ``user`` is subscribed to
+    each author. Tags, ingredients and authors take one query each, like
+    the prefetches of the DRF path, and come in the same order.
+    """
+    ids = [recipe.id for recipe in recipes]
+    tags = defaultdict(list)
+    for recipe_id, *values in Tag.objects.filter(
+        recipetag__recipe__in=ids
+    ).values_list('recipetag__recipe_id', *TAG_FIELDS):
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+    ingredients = defaultdict(list)
+    for recipe_id, *values in RecipeIngredient.objects.filter(
+        recipe__in=ids
+    ).values_list(
+        'recipe_id',
+        'ingredient__id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount'
+    ):
+        ingredients[recipe_id].append(dict(zip(INGREDIENT_FIELDS, values)))
+    authors = {}
+    subscriptions = {}
+    for author in read_authors(user).filter(
+        id__in={recipe.author_id for recipe in recipes}
+    ).values(*USER_FIELDS, 'is_subscribed'):
+        subscriptions[author['id']] = author.pop('is_subscribed')
+        author['is_subscribed'] = False
+        authors[author['id']] = author
+    fragments = {}
+    for recipe in recipes:
+        image, image_variants = image_fields(request, recipe.image.name)
+        fragments[recipe.id] = {
+            'id': recipe.id,
+            'tags': tags[recipe.id],
+            'author': dict(authors[recipe.author_id]),
+            'ingredients': ingredients[recipe.id],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': recipe.name,
+            'image': image,
+            'image_variants': image_variants,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time
+        }
+    return fragments, subscriptions
+
+
+def serialize_short_recipes(request, recipes):
+    """Same as ``ShortRecipeSerializer(recipes, many=True).data``."""
+    result = []
+    for recipe in recipes:
+        image, image_variants = image_fields(request, recipe.image.name)
+        result.append({
+            'id': recipe.id,
+            'name': recipe.name,
+            'image': image,
+            'image_variants': image_variants,
+            'cooking_time': recipe.cooking_time
+        })
+    return result
+
+
+def serialize_subscriptions(request, subscriptions, author_recipes):
+    """Same as ``SubscriptionSerializer(subscriptions, many=True).data``.
+
+    ``author_recipes`` maps every author id to the recipes to show.
+    """
+    result = []
+    for subscription in subscriptions:
+        author = subscription.author
+        data = user_dict(author, True)
+        data['recipes'] = serialize_short_recipes(
+            request, author_recipes[author.id]
+        )
+        data['recipes_count'] = author.recipe_count
+        result.append(data)
+    return result
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.conditional import AUTHOR_SCOPE, RECIPE_SCOPE, get_versions
+
+FRAGMENT_KEY = 'recipe_fragment:{}:{}'
+SHARED_SCOPES = ('tags', 'ingredients')
+
+
+def fragment_versions(recipes):
+    """Return the version tuple every recipe's fragment is valid for.
+
+    Per-recipe and per-author versions are kept in the fragment cache
+    itself, so that they do not crowd out the shared versions.
+    """
+    shared = tuple(get_versions(SHARED_SCOPES))
+    scopes = set()
+    for recipe in recipes:
+        scopes.add(RECIPE_SCOPE.format(recipe.id))
+        scopes.add(AUTHOR_SCOPE.format(recipe.author_id))
+    scopes = list(scopes)
+    versions = dict(zip(scopes, get_versions(scopes, using='fragments')))
+    return {
+        recipe.id: shared + (
+            versions[RECIPE_SCOPE.format(recipe.id)],
+            versions[AUTHOR_SCOPE.format(recipe.author_id)]
+        )
+        for recipe in recipes
+    }
+
+
+def fragment_prefix(request):
+    # Image URLs are absolute, so fragments are kept per site address.
+    if request is None:
+        return ''
+    return hashlib.md5(request.build_absolute_uri('/').encode()).hexdigest()
+
+
+def get_fragments(request, versions):
+    """Return the cached fragments of the recipes that are still current."""
+    prefix = fragment_prefix(request)
+    keys = {
+        FRAGMENT_KEY.format(prefix, recipe_id): recipe_id
+        for recipe_id in versions
+    }
+    return {
+        keys[key]: entry['data']
+        for key, entry in caches['fragments'].get_many(list(keys)).items()
+        if entry['version'] == versions[keys[key]]
+    }
+
+
+def set_fragments(request, versions, fragments):
+    prefix = fragment_prefix(request)
+    caches['fragments'].set_many(
+        {
+            FRAGMENT_KEY.format(prefix, recipe_id): {
+                'version': versions[recipe_id],
+                'data': data
+            }
+            for recipe_id, data in fragments.items()
+        },
+        settings.RECIPE_FRAGMENT_TIMEOUT
+    )
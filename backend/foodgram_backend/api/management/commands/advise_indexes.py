@@ -0,0 +1,137 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from core.queries import (
+    PLAN_VENDORS,
+    QueryRecorder,
+    fingerprint,
+    plan_problems
+)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every read endpoint against the current database, run '
+        'EXPLAIN on the queries behind it and report sequential scans and '
+        'sorts that no index supports. Full listings of small tables, such '
+        'as tags, are expected to scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='Id of the user to request as, the first user by default.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PLAN_VENDORS:
+            raise CommandError(
+                f'Query plans can not be read on {connection.vendor}, '
+                f'use one of: {", ".join(PLAN_VENDORS)}.'
+            )
+        user = User.objects.order_by('id')
+        if options['user'] is not None:
+            user = user.filter(id=options['user'])
+        user = user.first()
+        recipe = Recipe.objects.order_by('-id').first()
+        if user is None or recipe is None:
+            raise CommandError('Add at least one user and recipe first.')
+        client = APIClient()
+        client.force_authenticate(user)
+        total = 0
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            for name, url in self.get_endpoints(recipe):
+                total += self.advise(client, name, url)
+        if total:
+            self.stdout.write(self.style.WARNING(
+                f'{total} unindexed scans or sorts.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Every query is served by an index.'
+            ))
+
+    def get_endpoints(self, recipe):
+        tag = Tag.objects.values_list('slug', flat=True).first() or ''
+        ingredient = Ingredient.objects.values_list(
+            'name', flat=True
+        ).first() or ''
+        word = recipe.name.split()[0] if recipe.name.split() else ''
+        return (
+            ('tags-list', '/api/tags/'),
+            (
+                'ingredients-list',
+                f'/api/ingredients/?name={quote(ingredient[:1])}'
+            ),
+            ('recipes-list', '/api/recipes/?page=1&limit=6'),
+            ('recipes-list-cursor', '/api/recipes/?cursor=&limit=6'),
+            ('recipes-list-tags', f'/api/recipes/?tags={tag}&limit=6'),
+            (
+                'recipes-list-author',
+                f'/api/recipes/?author={recipe.author_id}&limit=6'
+            ),
+            (
+                'recipes-list-favorited',
+                '/api/recipes/?is_favorited=1&limit=6'
+            ),
+            (
+                'recipes-list-cart',
+                '/api/recipes/?is_in_shopping_cart=1&limit=6'
+            ),
+            ('recipes-search', f'/api/recipes/?search={quote(word)}&limit=6'),
+            ('recipes-detail', f'/api/recipes/{recipe.id}/'),
+            (
+                'download_shopping_cart',
+                '/api/recipes/download_shopping_cart/'
+            ),
+            (
+                'shopping_cart-summary',
+                '/api/recipes/shopping_cart/summary/'
+            ),
+            ('users-list', '/api/users/?page=1&limit=6'),
+            ('users-detail', f'/api/users/{recipe.author_id}/'),
+            ('users-me', '/api/users/me/'),
+            ('subscriptions-list', '/api/users/subscriptions/?limit=6'),
+        )
+
+    def advise(self, client, name, url):
+        recorder = QueryRecorder()
+        # Empty caches, so that every query behind the response runs.
+        with override_settings(CACHES={
+            alias: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'advise-indexes-{name}-{alias}'
+            }
+            for alias in settings.CACHES
+        }):
+            with connection.execute_wrapper(recorder):
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+        if response.status_code != 200:
+            self.stdout.write(self.style.ERROR(
+                f'{name}: {url} answered {response.status_code}'
+            ))
+            return 0
+        self.stdout.write(f'{name} ({len(recorder.queries)} queries)')
+        found = 0
+        seen = set()
+        for sql, params in recorder.queries:
+            key = fingerprint(sql)
+            if key in seen:
+                continue
+            seen.add(key)
+            for problem in plan_problems(sql, params):
+                found += 1
+                self.stdout.write(self.style.WARNING(f'  {problem}'))
+                self.stdout.write(f'      {key[:200]}')
+        return found
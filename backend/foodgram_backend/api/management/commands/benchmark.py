@@ -0,0 +1,577 @@
+import base64
+import gc
+import json
+import random
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.queries import RepeatedQueryDetector
+from recipes.counters import rebuild_counters
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    RecipeUser,
+    Tag
+)
+from recipes.pantry_index import pantry_index
+from recipes.search import rebuild_search_index
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Subscription, User
+
+PASSWORD = 'benchmark-password'
+IMAGE = 'recipes/images/benchmark.png'
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+BATCH_SIZE = 5000
+
+Endpoint = namedtuple(
+    'Endpoint',
+    (
+        'name',
+        'method',
+        'url',
+        'max_queries',
+        'max_p95_ms',
+        'data',
+        'anonymous',
+        'setup',
+        'cleanup'
+    ),
+    defaults=(None, False, None, None)
+)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = int(round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway SQLite database, drive every API route through '
+        'the test client and fail when an endpoint exceeds its query or '
+        'latency budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[100, 10000, 100000],
+            help='Recipe counts to measure at, in increasing order.'
+        )
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Favorited (and half as many carted) recipes per user.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Subscribed authors per user.'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-latency', action='store_true',
+            help='Only enforce query budgets.'
+        )
+        parser.add_argument(
+            '--output', help='Write the raw results to this JSON file.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'The benchmark runs on SQLite only, '
+                'set DB_ENGINE=django.db.backends.sqlite3.'
+            )
+        self.options = options
+        self.random = random.Random(options['seed'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    PASSWORD_HASHERS=[
+                        'django.contrib.auth.hashers.MD5PasswordHasher'
+                    ]
+                ):
+                    results = self.run_benchmark()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+        violations = [
+            result for result in results if result['violations']
+        ]
+        if violations:
+            raise CommandError('\n'.join(
+                f"{result['endpoint']} @ {result['recipes']} recipes: "
+                f"{', '.join(result['violations'])}"
+                for result in violations
+            ))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget.'))
+
+    def run_benchmark(self):
+        self.seed_base()
+        results = []
+        for size in sorted(self.options['sizes']):
+            self.seed_recipes(size)
+            self.stdout.write(f'\n{size} recipes')
+            self.stdout.write(
+                f"{'endpoint':32}{'queries':>8}{'p50 ms':>9}"
+                f"{'p95 ms':>9}{'bytes':>10}"
+            )
+            for endpoint in self.get_endpoints():
+                result = self.measure(endpoint)
+                result['recipes'] = size
+                results.append(result)
+                line = (
+                    f"{result['endpoint']:32}{result['queries']:>8}"
+                    f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+                    f"{result['bytes']:>10}"
+                )
+                if result['violations']:
+                    line = self.style.ERROR(line)
+                self.stdout.write(line)
+            self.stdout.write('\nfast serializers, 100-item pages')
+            call_command(
+                'check_serializers', user=self.user.id, stdout=self.stdout
+            )
+        return results
+
+    def seed_base(self):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                first_name='First',
+                last_name='Last',
+                password=password
+            )
+            for index in range(self.options['users'])
+        )
+        self.users = list(User.objects.order_by('id'))
+        self.user = self.users[0]
+        self.token = Token.objects.create(user=self.user)
+        Tag.objects.bulk_create(
+            Tag(name=f'Tag {index}', color='#E26C2D', slug=f'tag{index}')
+            for index in range(self.options['tags'])
+        )
+        self.tags = list(Tag.objects.values_list('id', flat=True))
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        subscriptions = []
+        authors = self.users[1:]
+        for user in self.users:
+            for author in self.random.sample(
+                authors, min(self.options['subscriptions'], len(authors))
+            ):
+                if author != user:
+                    subscriptions.append(
+                        Subscription(author=author, subscriber=user)
+                    )
+        Subscription.objects.bulk_create(subscriptions)
+        subscribed = set(Subscription.objects.filter(
+            subscriber=self.user
+        ).values_list('author_id', flat=True))
+        self.free_author = next(
+            user for user in authors if user.id not in subscribed
+        )
+        self.recipes_count = 0
+
+    def seed_recipes(self, size):
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        while self.recipes_count < size:
+            count = min(BATCH_SIZE, size - self.recipes_count)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=self.random.choice(self.users),
+                    name=f'Recipe {self.recipes_count + index}',
+                    text='Benchmark recipe text. ' * 10,
+                    cooking_time=self.random.randint(1, 120),
+                    image=IMAGE
+                )
+                for index in range(count)
+            )
+            self.recipes_count += count
+        new_ids = list(Recipe.objects.filter(
+            id__gt=last_id
+        ).values_list('id', flat=True))
+        recipe_tags = []
+        recipe_ingredients = []
+        for recipe_id in new_ids:
+            for tag_id in self.random.sample(
+                self.tags, min(2, len(self.tags))
+            ):
+                recipe_tags.append(
+                    RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                )
+            for ingredient_id in self.random.sample(self.ingredients, 5):
+                recipe_ingredients.append(RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500)
+                ))
+        RecipeTag.objects.bulk_create(recipe_tags)
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        rebuild_search_index()
+        pantry_index.invalidate()
+        pantry_index.refresh()
+        if not last_id:
+            self.seed_recipe_users(new_ids)
+        rebuild_counters(batch_size=BATCH_SIZE)
+        rebuild_shopping_lists(batch_size=BATCH_SIZE)
+        self.own_recipe = Recipe.objects.filter(author=self.user).first()
+        if self.own_recipe is None:
+            self.own_recipe = self.create_recipe()
+        taken = set(RecipeUser.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+        self.free_recipe = Recipe.objects.exclude(id__in=taken).first()
+
+    def seed_recipe_users(self, recipe_ids):
+        recipe_users = []
+        for user in self.users:
+            sample = self.random.sample(
+                recipe_ids, min(self.options['favorites'], len(recipe_ids))
+            )
+            for index, recipe_id in enumerate(sample):
+                recipe_users.append(RecipeUser(
+                    recipe_id=recipe_id,
+                    user=user,
+                    is_favorited=True,
+                    is_in_shopping_cart=index % 2 == 0
+                ))
+        RecipeUser.objects.bulk_create(recipe_users)
+
+    def create_recipe(self):
+        recipe = Recipe.objects.create(
+            author=self.user,
+            name='Own recipe',
+            text='Benchmark recipe text.',
+            cooking_time=10,
+            image=IMAGE
+        )
+        recipe.tags.set(self.tags[:1])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=1
+            )
+            for ingredient_id in self.ingredients[:3]
+        )
+        return recipe
+
+    def get_endpoints(self):
+        recipe = self.free_recipe
+        recipe_data = {
+            'name': 'Benchmark',
+            'text': 'Benchmark recipe text.',
+            'cooking_time': 10,
+            'image': PNG,
+            'tags': self.tags[:2],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in self.ingredients[:10]
+            ]
+        }
+
+        def set_recipe_user(**flags):
+            def setup():
+                RecipeUser.objects.update_or_create(
+                    user=self.user, recipe=recipe, defaults=flags
+                )
+            return setup
+
+        def delete_recipe_user(response=None):
+            RecipeUser.objects.filter(user=self.user, recipe=recipe).delete()
+
+        batch = list(Recipe.objects.exclude(
+            recipe_user__user=self.user
+        ).values_list('id', flat=True)[:20])
+
+        def set_batch(**flags):
+            def setup():
+                RecipeUser.objects.bulk_create(
+                    RecipeUser(user=self.user, recipe_id=recipe_id, **flags)
+                    for recipe_id in batch
+                )
+            return setup
+
+        def delete_batch(response=None):
+            RecipeUser.objects.filter(
+                user=self.user, recipe_id__in=batch
+            ).delete()
+
+        def delete_created(model):
+            def cleanup(response):
+                model.objects.filter(id=response.data['id']).delete()
+            return cleanup
+
+        def subscribe():
+            Subscription.objects.create(
+                author=self.free_author, subscriber=self.user
+            )
+
+        def unsubscribe(response=None):
+            Subscription.objects.filter(
+                author=self.free_author, subscriber=self.user
+            ).delete()
+
+        def restore_token(response):
+            Token.objects.create(key=self.token.key, user=self.user)
+
+        def create_own_recipe():
+            self.disposable_recipe = self.create_recipe()
+
+        middle = Recipe.objects.order_by('-pub_date', '-id')[
+            self.recipes_count // 2
+        ]
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [middle.pub_date.isoformat(), middle.id]
+        ).encode()).decode()
+
+        return [
+            Endpoint('tags-list', 'get', '/api/tags/', 1, 50, anonymous=True),
+            Endpoint(
+                'tags-detail', 'get', f'/api/tags/{self.tags[0]}/', 1, 50,
+                anonymous=True
+            ),
+            Endpoint(
+                'ingredients-list', 'get', '/api/ingredients/?name=%D0%B0',
+                1, 200, anonymous=True
+            ),
+            Endpoint(
+                'ingredients-detail', 'get',
+                f'/api/ingredients/{self.ingredients[0]}/', 1, 50,
+                anonymous=True
+            ),
+            Endpoint(
+                'recipes-list', 'get', '/api/recipes/?limit=100', 7, 800
+            ),
+            Endpoint(
+                'recipes-list-anonymous', 'get',
+                '/api/recipes/?limit=100', 5, 800, anonymous=True
+            ),
+            Endpoint(
+                'recipes-list-cursor', 'get',
+                f'/api/recipes/?cursor={cursor}&limit=100', 5, 800
+            ),
+            Endpoint(
+                'recipes-list-filtered', 'get',
+                '/api/recipes/?limit=6&is_favorited=1'
+                f'&tags={self.tag_slugs[0]}&tags={self.tag_slugs[1]}',
+                6, 200
+            ),
+            Endpoint(
+                'recipes-search', 'get',
+                '/api/recipes/?limit=10&search=recipe%2012', 6, 300
+            ),
+            Endpoint(
+                'recipes-pantry', 'get',
+                '/api/recipes/pantry/?limit=20&'
+                + '&'.join(
+                    f'ingredients={ingredient_id}'
+                    for ingredient_id in self.ingredients[:10]
+                ),
+                3, 50, anonymous=True
+            ),
+            Endpoint(
+                'recipes-detail', 'get', f'/api/recipes/{recipe.id}/', 5, 50
+            ),
+            Endpoint(
+                'recipes-create', 'post', '/api/recipes/', 16, 300,
+                data=recipe_data, cleanup=delete_created(Recipe)
+            ),
+            Endpoint(
+                'recipes-partial-update', 'patch',
+                f'/api/recipes/{self.own_recipe.id}/', 26, 300,
+                data=recipe_data
+            ),
+            Endpoint(
+                'recipes-destroy', 'delete', '/api/recipes/{recipe}/', 12, 100,
+                setup=create_own_recipe
+            ),
+            Endpoint(
+                'favorite-create', 'post',
+                f'/api/recipes/{recipe.id}/favorite/', 8, 50,
+                cleanup=delete_recipe_user
+            ),
+            Endpoint(
+                'favorite-destroy', 'delete',
+                f'/api/recipes/{recipe.id}/favorite/', 5, 50,
+                setup=set_recipe_user(is_favorited=True),
+                cleanup=delete_recipe_user
+            ),
+            Endpoint(
+                'shopping_cart-create', 'post',
+                f'/api/recipes/{recipe.id}/shopping_cart/', 10, 50,
+                cleanup=delete_recipe_user
+            ),
+            Endpoint(
+                'shopping_cart-destroy', 'delete',
+                f'/api/recipes/{recipe.id}/shopping_cart/', 7, 50,
+                setup=set_recipe_user(is_in_shopping_cart=True),
+                cleanup=delete_recipe_user
+            ),
+            Endpoint(
+                'shopping_cart-batch-create', 'post',
+                '/api/recipes/shopping_cart/', 8, 100,
+                data={'recipes': batch}, cleanup=delete_batch
+            ),
+            Endpoint(
+                'favorite-batch-destroy', 'delete',
+                '/api/recipes/favorite/', 6, 100,
+                data={'recipes': batch},
+                setup=set_batch(is_favorited=True), cleanup=delete_batch
+            ),
+            Endpoint(
+                'download_shopping_cart', 'get',
+                '/api/recipes/download_shopping_cart/', 2, 200
+            ),
+            Endpoint(
+                'shopping_cart-summary', 'get',
+                '/api/recipes/shopping_cart/summary/', 1, 100
+            ),
+            Endpoint('users-list', 'get', '/api/users/?limit=100', 3, 500),
+            Endpoint(
+                'users-detail', 'get', f'/api/users/{self.free_author.id}/',
+                3, 50
+            ),
+            Endpoint(
+                'users-create', 'post', '/api/users/', 5, 100,
+                data={
+                    'email': 'new@example.com',
+                    'username': 'new',
+                    'first_name': 'New',
+                    'last_name': 'User',
+                    'password': PASSWORD
+                },
+                anonymous=True,
+                cleanup=delete_created(User)
+            ),
+            Endpoint('users-me', 'get', '/api/users/me/', 2, 50),
+            Endpoint(
+                'set_password', 'post', '/api/users/set_password/', 4, 100,
+                data={'new_password': PASSWORD, 'current_password': PASSWORD}
+            ),
+            Endpoint(
+                'subscribe-create', 'post',
+                f'/api/users/{self.free_author.id}/subscribe/', 8, 100,
+                cleanup=unsubscribe
+            ),
+            Endpoint(
+                'subscribe-destroy', 'delete',
+                f'/api/users/{self.free_author.id}/subscribe/', 6, 50,
+                setup=subscribe
+            ),
+            Endpoint(
+                'subscriptions-list', 'get',
+                '/api/users/subscriptions/?limit=6&recipes_limit=3', 3, 200
+            ),
+            Endpoint(
+                'token-login', 'post', '/api/auth/token/login/', 4, 100,
+                data={'email': self.user.email, 'password': PASSWORD},
+                anonymous=True
+            ),
+            Endpoint(
+                'token-logout', 'post', '/api/auth/token/logout/', 4, 50,
+                cleanup=restore_token
+            ),
+        ]
+
+    def measure(self, endpoint):
+        client = APIClient()
+        if not endpoint.anonymous:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        timings = []
+        queries = 0
+        size = 0
+        repeated = set()
+        for _ in range(self.options['repeat']):
+            if endpoint.setup:
+                endpoint.setup()
+            url = endpoint.url
+            if '{recipe}' in url:
+                url = url.format(recipe=self.disposable_recipe.id)
+            # Like timeit, keep collector pauses out of the timed request.
+            detector = RepeatedQueryDetector(
+                settings.QUERY_REPEAT_THRESHOLD
+            )
+            gc.disable()
+            try:
+                with CaptureQueriesContext(connection) as context, \
+                        connection.execute_wrapper(detector):
+                    start = time.perf_counter()
+                    response = getattr(client, endpoint.method)(
+                        url, endpoint.data, format='json'
+                    )
+                    content = (
+                        b''.join(response.streaming_content)
+                        if response.streaming else response.content
+                    )
+                    timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                gc.enable()
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{endpoint.name} returned {response.status_code}: '
+                    f'{content[:200]!r}'
+                )
+            queries = max(queries, len(context.captured_queries))
+            repeated.update(detector.problems())
+            size = len(content)
+            if endpoint.cleanup:
+                endpoint.cleanup(response)
+        result = {
+            'endpoint': endpoint.name,
+            'queries': queries,
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'bytes': size,
+            'violations': []
+        }
+        if queries > endpoint.max_queries:
+            result['violations'].append(
+                f'{queries} queries > {endpoint.max_queries}'
+            )
+        result['violations'].extend(
+            f'repeated queries: {problem}' for problem in sorted(repeated)
+        )
+        if (
+            not self.options['skip_latency']
+            and result['p95_ms'] > endpoint.max_p95_ms
+        ):
+            result['violations'].append(
+                f"p95 {result['p95_ms']:.1f} ms > {endpoint.max_p95_ms} ms"
+            )
+        return result
@@ -0,0 +1,137 @@
+import gc
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import ForcedAuthentication, Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import (
+    RecipeReadSerializer,
+    SubscriptionSerializer,
+    UserSerializer
+)
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+def render(items):
+    return [JSONRenderer().render(item) for item in items]
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the fast list serializers render byte-identical output '
+        'to the DRF serializers on the current data, and time both.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Items per serialized page.'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--user', type=int,
+            help='Id of the viewing user, anonymous by default.'
+        )
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        user = AnonymousUser()
+        if options['user'] is not None:
+            user = User.objects.get(id=options['user'])
+        self.request = Request(
+            APIRequestFactory().get('/api/', {'recipes_limit': 3}),
+            authenticators=(ForcedAuthentication(user, None),)
+        )
+        self.repeat = options['repeat']
+        mismatches = []
+        for name, load, serialize in (
+            ('recipes', lambda: list(Recipe.objects.all()[:limit]),
+             self.serialize_recipes),
+            ('users', lambda: list(self.users()[:limit]),
+             self.serialize_users),
+            ('subscriptions', lambda: list(
+                Subscription.objects.select_related('author')
+                .order_by('id')[:limit]
+            ), self.serialize_subscriptions),
+        ):
+            expected, slow = self.measure(load, serialize, False)
+            actual, fast = self.measure(load, serialize, True)
+            self.stdout.write(
+                f'{name:15}{len(expected):6} items   drf {slow:8.1f} ms   '
+                f'fast {fast:8.1f} ms   {slow / max(fast, 1e-6):5.1f}x'
+            )
+            if expected != actual:
+                index = next(
+                    (
+                        index for index, (left, right)
+                        in enumerate(zip(expected, actual)) if left != right
+                    ),
+                    min(len(expected), len(actual))
+                )
+                mismatches.append(
+                    f'{name} item {index}:\n'
+                    f'  drf:  {expected[index:index + 1]}\n'
+                    f'  fast: {actual[index:index + 1]}'
+                )
+        if mismatches:
+            raise CommandError(
+                'Fast serializers differ from DRF:\n' + '\n'.join(mismatches)
+            )
+        self.stdout.write(self.style.SUCCESS('Fast serializers match DRF.'))
+
+    def measure(self, load, serialize, fast):
+        """Return the rendered items and the median serialization time."""
+        timings = []
+        for _ in range(self.repeat):
+            # Every run gets fresh instances, prefetches stick to them.
+            items = load()
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                with override_settings(FAST_READ_SERIALIZERS=fast):
+                    result = serialize(items, fast)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                gc.enable()
+        return render(result), statistics.median(timings)
+
+    def users(self):
+        user = self.request.user
+        queryset = User.objects.order_by('id')
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(
+                author=OuterRef('pk'), subscriber=user
+            )
+        ))
+
+    def serialize_recipes(self, recipes, fast):
+        # Fragments are compared as built, the cache would hide the builder.
+        fragments, subscriptions = RecipeReadSerializer(
+            context={'request': self.request}
+        ).build_fragments(recipes, fast)
+        return [
+            {
+                **fragments[recipe.id],
+                'subscribed': subscriptions.get(recipe.author_id)
+            }
+            for recipe in recipes
+        ]
+
+    def serialize_users(self, users, fast):
+        return UserSerializer(
+            users, many=True, context={'request': self.request}
+        ).data
+
+    def serialize_subscriptions(self, subscriptions, fast):
+        return SubscriptionSerializer(
+            subscriptions, many=True, context={'request': self.request}
+        ).data
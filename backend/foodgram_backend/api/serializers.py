@@ -4,16 +4,31 @@ from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import check_password, make_password
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from rest_framework import exceptions, serializers, validators
 
+from .fast_serializers import (
+    serialize_recipe_fragments,
+    serialize_subscriptions,
+    serialize_users
+)
+from .fragments import fragment_versions, get_fragments, set_fragments
 from recipes.models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
     RecipeUser,
-    Tag
+    ShoppingListItem,
+    Tag,
+    read_lookups
 )
+from recipes.counters import change_counter
+from recipes.images import save_recipe_image, variant_names
+from recipes.pantry_index import pantry_index
+from recipes.recipe_state import get_recipe_state
+from recipes.shopping_list import change_cart, change_carted_recipe
 from users.models import Subscription, User
 
 
@@ -41,6 +56,19 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class ShoppingListItemSerializer(RecipeIngredientSerializer):
+    class Meta(RecipeIngredientSerializer.Meta):
+        model = ShoppingListItem
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if not settings.FAST_READ_SERIALIZERS:
+            return super().to_representation(data)
+        users = data.all() if isinstance(data, Manager) else data
+        return serialize_users(self.context.get('request'), users)
+
+
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -61,12 +89,15 @@ class UserSerializer(serializers.ModelSerializer):
                 fields=('username', 'email')
             )
         ]
+        list_serializer_class = UserListSerializer
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         user = request.user if request else None
         if user and user.is_authenticated:
-            return obj.subscribers.filter(id=user.id).exists()
+            return obj.subscribers.filter(subscriber=user).exists()
         return False
 
     def to_representation(self, instance):
@@ -143,6 +174,26 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        variants = variant_names(value.name)
+        for formats in variants.values():
+            for image_format, name in formats.items():
+                url = value.storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                formats[image_format] = url
+        return variants
+
+
 class RecipeBaseSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
 
@@ -171,44 +222,121 @@ class RecipeWriteSerializer(RecipeBaseSerializer):
         read_only=True
     )
 
+    def validate_ingredients(self, value):
+        amounts = {}
+        for ingredient_data in value:
+            try:
+                ingredient_id = int(ingredient_data['id'])
+                amount = int(ingredient_data['amount'])
+            except (KeyError, TypeError, ValueError):
+                raise serializers.ValidationError(
+                    'Each ingredient needs an integer id and amount.'
+                )
+            if amount < 1:
+                raise serializers.ValidationError(
+                    'Ingredient amount must be positive.'
+                )
+            if ingredient_id in amounts:
+                raise serializers.ValidationError(
+                    f'Ingredient {ingredient_id} is listed twice.'
+                )
+            amounts[ingredient_id] = amount
+        missing = set(amounts) - set(
+            Ingredient.objects.filter(
+                id__in=amounts
+            ).values_list('id', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Unknown ingredients: {sorted(missing)}.'
+            )
+        return amounts
+
+    @transaction.atomic
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
+        validated_data['image'] = save_recipe_image(validated_data['image'])
+        amounts = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(
             **validated_data, author=self.context['request'].user
         )
         recipe.tags.set(tags)
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data.pop('id')
-            amount = ingredient_data.pop('amount')
-            ingredient = get_object_or_404(Ingredient, id=ingredient_id)
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
+            for ingredient_id, amount in amounts.items()
+        )
+        transaction.on_commit(lambda: pantry_index.mark_changed(recipe.id))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data.pop('id')
-            amount = ingredient_data.pop('amount')
-            ingredient = Ingredient.objects.get(id=ingredient_id)
-            RecipeIngredient.objects.create(
-                recipe=instance,
-                ingredient=ingredient,
-                amount=amount
+        if 'image' in validated_data:
+            validated_data['image'] = save_recipe_image(
+                validated_data['image']
+            )
+        amounts = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if amounts is not None:
+            self.update_ingredients(instance, amounts)
+            transaction.on_commit(
+                lambda: pantry_index.mark_changed(instance.id)
+            )
+        return super().update(instance, validated_data)
+
+    def update_ingredients(self, recipe, amounts):
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipeingredient_set.all()
+        }
+        stale = set(existing) - set(amounts)
+        if stale:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=stale
+            ).delete()
+        deltas = {
+            ingredient_id: -existing[ingredient_id].amount
+            for ingredient_id in stale
+        }
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            recipe_ingredient = existing.get(ingredient_id)
+            deltas[ingredient_id] = amount - (
+                recipe_ingredient.amount if recipe_ingredient else 0
             )
-        return instance
+            if recipe_ingredient and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        )
+        if any(deltas.values()):
+            change_carted_recipe(recipe.id, deltas)
 
     def to_representation(self, instance):
+        instance = Recipe.objects.get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=self.context).data
 
 
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+
+
+class RecipeReadListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.represent(
+            list(recipes), fast=settings.FAST_READ_SERIALIZERS
+        )
+
+
 class RecipeReadSerializer(RecipeBaseSerializer):
     tags = TagSerializer(many=True)
     ingredients = RecipeIngredientSerializer(
@@ -217,6 +345,7 @@ class RecipeReadSerializer(RecipeBaseSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     author = UserSerializer()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -229,27 +358,134 @@ class RecipeReadSerializer(RecipeBaseSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
+        list_serializer_class = RecipeReadListSerializer
+
+    def to_representation(self, instance):
+        return self.represent([instance])[0]
+
+    def represent(self, recipes, fast=False):
+        """Serialize recipes from their cached viewer-independent fragments.
+
+        Only recipes without a current fragment are built, by the DRF
+        fields or, with ``fast``, by the fast serializer; the viewer's
+        flags are filled in for all of them.
+        """
+        request = self.context.get('request')
+        versions = fragment_versions(recipes)
+        fragments = get_fragments(request, versions)
+        missing = [recipe for recipe in recipes if recipe.id not in fragments]
+        subscriptions = {}
+        if missing:
+            built, subscriptions = self.build_fragments(missing, fast)
+            set_fragments(request, versions, built)
+            fragments.update(built)
+        subscribed = self.get_subscribed_authors(recipes, subscriptions)
+        result = []
+        for recipe in recipes:
+            data = fragments[recipe.id]
+            for field in USER_FLAGS:
+                data[field] = self.get_recipe_flag(recipe, field)
+            if request is not None and request.method == 'POST':
+                data['author'].pop('is_subscribed')
+            else:
+                data['author']['is_subscribed'] = (
+                    recipe.author_id in subscribed
+                )
+            result.append(data)
+        return result
+
+    def build_fragments(self, recipes, fast=False):
+        """Serialize recipes with the viewer's flags unset.
+
+        Also returns whether the viewer is subscribed to each author.
+        """
+        request = self.context.get('request')
+        user = request.user if request is not None else None
+        if fast:
+            return serialize_recipe_fragments(request, recipes, user)
+        prefetch_related_objects(recipes, *read_lookups(user))
+        fragments = {}
+        subscriptions = {}
+        for recipe in recipes:
+            data = super().to_representation(recipe)
+            if hasattr(recipe.author, 'is_subscribed'):
+                subscriptions[recipe.author_id] = recipe.author.is_subscribed
+            for field in USER_FLAGS:
+                data[field] = False
+            data['author']['is_subscribed'] = False
+            fragments[recipe.id] = data
+        return fragments, subscriptions
+
+    def get_subscribed_authors(self, recipes, subscriptions):
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
+            return set()
+        subscribed = {
+            author_id for author_id, value in subscriptions.items() if value
+        }
+        unknown = {
+            recipe.author_id for recipe in recipes
+        } - set(subscriptions)
+        if unknown:
+            subscribed.update(Subscription.objects.filter(
+                subscriber=request.user, author_id__in=unknown
+            ).values_list('author_id', flat=True))
+        return subscribed
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        try:
-            return obj.recipe_user.get(user=user).is_favorited
-        except RecipeUser.DoesNotExist:
-            return False
+        return self.get_recipe_flag(obj, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
+        return self.get_recipe_flag(obj, 'is_in_shopping_cart')
+
+    def get_recipe_flag(self, obj, field):
+        if hasattr(obj, field):
+            return getattr(obj, field)
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        try:
-            return obj.recipe_user.get(user=user).is_in_shopping_cart
-        except RecipeUser.DoesNotExist:
-            return False
+        if 'recipe_state' not in self.context:
+            self.context['recipe_state'] = get_recipe_state(user.id)
+        return obj.id in self.context['recipe_state'][field]
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit') if request else None
+    if limit is None:
+        return settings.SUBSCRIPTION_RECIPES_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise exceptions.ValidationError(
+            {'recipes_limit': 'Must be a non-negative integer.'}
+        )
+    return min(limit, settings.SUBSCRIPTION_RECIPES_LIMIT)
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        subscriptions = list(data)
+        limit = get_recipes_limit(self.context.get('request'))
+        author_recipes = {
+            subscription.author_id: [] for subscription in subscriptions
+        }
+        if author_recipes and limit:
+            for recipe in Recipe.objects.latest_by_author(
+                author_recipes, limit
+            ):
+                author_recipes[recipe.author_id].append(recipe)
+        self.context['author_recipes'] = author_recipes
+        if settings.FAST_READ_SERIALIZERS:
+            return serialize_subscriptions(
+                self.context.get('request'), subscriptions, author_recipes
+            )
+        return super().to_representation(subscriptions)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -260,7 +496,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='author.recipe.count')
+    recipes_count = serializers.ReadOnlyField(source='author.recipe_count')
 
     class Meta:
         model = Subscription
@@ -274,16 +510,19 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count'
         )
+        list_serializer_class = SubscriptionListSerializer
 
     def get_is_subscribed(self, obj):
         if obj:
             return True
 
     def get_recipes(self, obj):
-        limit = self.context.get('request').GET.get('recipes_limit')
-        recipe_obj = obj.author.recipe.all()
-        if limit:
-            recipe_obj = recipe_obj[:int(limit)]
+        author_recipes = self.context.get('author_recipes', {})
+        if obj.author_id in author_recipes:
+            recipe_obj = author_recipes[obj.author_id]
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipe_obj = obj.author.recipe.all()[:limit]
         serializer = ShortRecipeSerializer(
             recipe_obj, many=True, context=self.context
         )
@@ -300,24 +539,60 @@ class IsFavoritedSerializer(serializers.ModelSerializer):
         serializer = ShortRecipeSerializer(instance.recipe)
         return serializer.data
 
+    @transaction.atomic
     def create(self, validated_data):
         user = self.context.get('request').user
         recipe_id = self.context.get('view').kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        obj = RecipeUser.objects.get_or_create(user=user, recipe=recipe)[0]
+        # Locked, so that a repeated request waits and then sees the flag.
+        obj = RecipeUser.objects.select_for_update().get_or_create(
+            user=user, recipe=recipe
+        )[0]
         if obj.is_favorited is True:
             raise exceptions.ValidationError(
                 "This recipe is already in favorite"
             )
         obj.is_favorited = True
         obj.save()
+        change_counter(Recipe, recipe.id, 'favorite_count', 1)
         return obj
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_LIMIT
+    )
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+    limit = serializers.IntegerField(
+        min_value=1, default=settings.PANTRY_RESULTS_LIMIT
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_limit(self, value):
+        return min(value, settings.PANTRY_RESULTS_LIMIT)
+
+
+class PantryRecipeSerializer(ShortRecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + ('coverage', 'missing')
 
 
 class IsInShoppingCartSerializer(serializers.ModelSerializer):
@@ -330,15 +605,20 @@ class IsInShoppingCartSerializer(serializers.ModelSerializer):
         serializer = ShortRecipeSerializer(instance.recipe)
         return serializer.data
 
+    @transaction.atomic
     def create(self, validated_data):
         user = self.context.get('request').user
         recipe_id = self.context.get('view').kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        obj = RecipeUser.objects.get_or_create(user=user, recipe=recipe)[0]
+        # Locked, so that a repeated request waits and then sees the flag.
+        obj = RecipeUser.objects.select_for_update().get_or_create(
+            user=user, recipe=recipe
+        )[0]
         if obj.is_in_shopping_cart is True:
             raise exceptions.ValidationError(
                 "This recipe is already in shopping cart"
             )
         obj.is_in_shopping_cart = True
         obj.save()
+        change_cart(user.id, [recipe.id], 1)
         return obj
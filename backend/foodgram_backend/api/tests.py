@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    RecipeUser,
+    Tag
+)
+from users.models import Subscription, User
+
+
+class FastSerializerParityTest(TestCase):
+    """The fast list serializers must render what the DRF ones render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                first_name='First',
+                last_name='Last',
+                password='password'
+            )
+            for index in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Tag {index}', color='#E26C2D', slug=f'tag{index}'
+            )
+            for index in range(2)
+        ]
+        ingredients = list(Ingredient.objects.order_by('id')[:3])
+        for index in range(4):
+            recipe = Recipe.objects.create(
+                author=cls.users[index % 2],
+                name=f'Recipe {index}',
+                text='Recipe text.',
+                cooking_time=index + 1,
+                image='recipes/images/recipe.png'
+            )
+            # The last recipe has no tags and no ingredients.
+            if index < 3:
+                RecipeTag.objects.create(recipe=recipe, tag=tags[index % 2])
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe=recipe, ingredient=ingredient, amount=index + 1
+                    )
+                    for ingredient in ingredients[:index + 1]
+                )
+            RecipeUser.objects.create(
+                recipe=recipe,
+                user=cls.users[0],
+                is_favorited=index % 2 == 0,
+                is_in_shopping_cart=index < 2
+            )
+        Subscription.objects.create(
+            author=cls.users[1], subscriber=cls.users[0]
+        )
+        Subscription.objects.create(
+            author=cls.users[0], subscriber=cls.users[2]
+        )
+
+    def check_serializers(self, **options):
+        # The command raises CommandError on any difference.
+        call_command(
+            'check_serializers', repeat=1, stdout=StringIO(), **options
+        )
+
+    def test_anonymous(self):
+        self.check_serializers()
+
+    def test_authenticated(self):
+        for user in self.users:
+            with self.subTest(user=user.username):
+                self.check_serializers(user=user.id)
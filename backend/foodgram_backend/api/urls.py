@@ -2,12 +2,16 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
+    FavoriteBatchViewSet,
     IngredientViewSet,
     IsFavoritedViewSet,
     IsInShoppingCartViewSet,
     RecipeViewSet,
+    ShoppingCartBatchViewSet,
     TagViewSet,
-    download_shopping_cart_view
+    download_shopping_cart_view,
+    metrics_view,
+    shopping_cart_summary_view
 )
 
 router = DefaultRouter()
@@ -23,6 +27,7 @@ is_in_shopping_cart_urls = IsInShoppingCartViewSet.as_view({
     'post': 'create',
     'delete': 'destroy'
 })
+batch_actions = {'post': 'create', 'delete': 'destroy'}
 
 urlpatterns = [
     path(
@@ -35,7 +40,27 @@ urlpatterns = [
         is_in_shopping_cart_urls,
         name='shopping_cart'
     ),
-    path('recipes/download_shopping_cart/', download_shopping_cart_view),
+    path(
+        'recipes/download_shopping_cart/',
+        download_shopping_cart_view,
+        name='download_shopping_cart'
+    ),
+    path(
+        'recipes/shopping_cart/summary/',
+        shopping_cart_summary_view,
+        name='shopping_cart-summary'
+    ),
+    path(
+        'recipes/favorite/',
+        FavoriteBatchViewSet.as_view(batch_actions),
+        name='favorite-batch'
+    ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartBatchViewSet.as_view(batch_actions),
+        name='shopping_cart-batch'
+    ),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include(router.urls)),
     path('', include('users.urls')),
 ]
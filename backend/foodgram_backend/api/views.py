@@ -1,12 +1,27 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from recipes.models import Ingredient, Recipe, RecipeUser, Tag
+from recipes.ingredient_index import ingredient_index
+from recipes.pantry_index import pantry_index
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeUser,
+    ShoppingListItem,
+    Tag
+)
+from recipes.recipe_state import apply_recipe_flags, clear_recipe_flag
 from rest_framework import (
     decorators,
     exceptions,
     mixins,
     permissions,
+    renderers,
     status,
     viewsets
 )
@@ -14,27 +29,41 @@ from rest_framework.response import Response
 
 from .filters import IngredientFilter, RecipeFilter
 from .permissions import IsAuthor
+from .renderers import CSVRenderer, PlainTextRenderer
 from .serializers import (
     IngredientSerializer,
     IsFavoritedSerializer,
     IsInShoppingCartSerializer,
+    PantryQuerySerializer,
+    PantryRecipeSerializer,
+    RecipeBatchSerializer,
     RecipeReadSerializer,
     RecipeWriteSerializer,
+    ShoppingListItemSerializer,
     TagSerializer
 )
+from core.conditional import ConditionalGetMixin, conditional_response
+from core.metrics import (
+    PROMETHEUS_CONTENT_TYPE, SerializerTimingMixin, request_metrics
+)
 from core.pagination import PageLimitPagination
 
 
 class TagViewSet(
+    SerializerTimingMixin,
+    ConditionalGetMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
 ):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    validator_scopes = ('tags',)
 
 
 class IngredientViewSet(
+    SerializerTimingMixin,
+    ConditionalGetMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -42,29 +71,84 @@ class IngredientViewSet(
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = IngredientFilter
+    authentication_classes = ()
+    validator_scopes = ('ingredients',)
+
+    def list(self, request, *args, **kwargs):
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        try:
+            limit = min(int(request.query_params['limit']), limit)
+        except (KeyError, ValueError):
+            pass
+        return conditional_response(
+            request,
+            self.validator_scopes,
+            lambda: Response(ingredient_index.search(
+                request.query_params.get('name', ''), max(limit, 1)
+            ))
+        )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    SerializerTimingMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     http_method_names = ('get', 'post', 'patch', 'delete')
     pagination_class = PageLimitPagination
+    cursor_ordering = ('-pub_date', '-id')
     filterset_class = RecipeFilter
     ordering_fields = ('-pub_date',)
+    validator_scopes = ('recipes',)
+    per_user_validator = True
+    cache_anonymous = True
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeReadSerializer
+        if self.action == 'pantry':
+            return PantryRecipeSerializer
         return RecipeWriteSerializer
 
     def get_permissions(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'pantry'):
             return (permissions.AllowAny(),)
         if self.action == 'create':
             return (permissions.IsAuthenticated(),)
         return (IsAuthor(),)
 
+    @decorators.action(detail=False)
+    def pantry(self, request):
+        """Recipes that can be cooked from the given ingredients."""
+        query = PantryQuerySerializer(data={
+            **request.query_params.dict(),
+            'ingredients': request.query_params.getlist('ingredients')
+        })
+        query.is_valid(raise_exception=True)
+        return conditional_response(
+            request,
+            ('recipes', 'ingredients'),
+            lambda: Response(self.get_serializer(
+                self.match_pantry(**query.validated_data), many=True
+            ).data)
+        )
+
+    def match_pantry(self, ingredients, limit, max_missing=None):
+        matches = pantry_index.match(ingredients, limit, max_missing)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        result = []
+        for recipe_id, coverage, missing in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = round(coverage, 3)
+                recipe.missing = missing
+                result.append(recipe)
+        return result
+
 
 class IsFavoritedViewSet(
+    SerializerTimingMixin,
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet
@@ -76,15 +160,17 @@ class IsFavoritedViewSet(
     def perform_destroy(self, instance):
         if instance.is_favorited is False:
             raise exceptions.ValidationError("This recipe is not in favorite")
-        instance.is_favorited = False
-        instance.save()
+        clear_recipe_flag(instance, 'is_favorited')
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
         user = request.user
         try:
-            instance = RecipeUser.objects.get(recipe=recipe, user=user)
+            instance = RecipeUser.objects.select_for_update().get(
+                recipe=recipe, user=user
+            )
         except RecipeUser.DoesNotExist:
             raise exceptions.ValidationError("This recipe is not in favorite")
         self.perform_destroy(instance)
@@ -92,6 +178,7 @@ class IsFavoritedViewSet(
 
 
 class IsInShoppingCartViewSet(
+    SerializerTimingMixin,
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet
@@ -105,15 +192,17 @@ class IsInShoppingCartViewSet(
             raise exceptions.ValidationError(
                 "This recipe is not in shopping cart"
             )
-        instance.is_in_shopping_cart = False
-        instance.save()
+        clear_recipe_flag(instance, 'is_in_shopping_cart')
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
         user = request.user
         try:
-            instance = RecipeUser.objects.get(recipe=recipe, user=user)
+            instance = RecipeUser.objects.select_for_update().get(
+                recipe=recipe, user=user
+            )
         except RecipeUser.DoesNotExist:
             raise exceptions.ValidationError(
                 "This recipe is not in shopping cart"
@@ -122,32 +211,126 @@ class IsInShoppingCartViewSet(
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def form_list(ingredient_total):
-    return "\n".join([
-        f"{ingredient['recipe__ingredients__name']} - "
-        f"{ingredient['total_amount']} "
-        f"{ingredient['recipe__ingredients__measurement_unit']}"
-        for ingredient in ingredient_total
-    ])
+class RecipeUserBatchViewSet(SerializerTimingMixin, viewsets.GenericViewSet):
+    """Add (POST) or remove (DELETE) a flag on a list of recipes at once."""
+    serializer_class = RecipeBatchSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    flag_field = None
+
+    def create(self, request, *args, **kwargs):
+        return self.apply_flags(request, True)
+
+    def destroy(self, request, *args, **kwargs):
+        return self.apply_flags(request, False)
+
+    def apply_flags(self, request, value):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(apply_recipe_flags(
+            request.user.id,
+            serializer.validated_data['recipes'],
+            self.flag_field,
+            value
+        ))
+
+
+class FavoriteBatchViewSet(RecipeUserBatchViewSet):
+    flag_field = 'is_favorited'
+
+
+class ShoppingCartBatchViewSet(RecipeUserBatchViewSet):
+    flag_field = 'is_in_shopping_cart'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def form_txt(ingredient_total):
+    for ingredient in ingredient_total:
+        yield (
+            f"{ingredient['ingredient__name']} - "
+            f"{ingredient['total_amount']} "
+            f"{ingredient['ingredient__measurement_unit']}\n"
+        )
+
+
+def form_csv(ingredient_total):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for ingredient in ingredient_total:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['total_amount'],
+            ingredient['ingredient__measurement_unit']
+        ))
+
+
+def form_json(ingredient_total):
+    yield '['
+    for number, ingredient in enumerate(ingredient_total):
+        yield (',' if number else '') + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'amount': ingredient['total_amount'],
+            'measurement_unit': ingredient['ingredient__measurement_unit']
+        }, ensure_ascii=False)
+    yield ']'
+
+
+SHOPPING_CART_FORMS = {
+    'txt': form_txt,
+    'csv': form_csv,
+    'json': form_json,
+}
 
 
 @decorators.api_view(['GET'])
 @decorators.permission_classes([permissions.IsAuthenticated])
+@decorators.renderer_classes([
+    PlainTextRenderer, CSVRenderer, renderers.JSONRenderer
+])
 def download_shopping_cart_view(request):
-    user = request.user
-    shopping_cart = RecipeUser.objects.filter(
-        user=user, is_in_shopping_cart=True
+    ingredient_total = ShoppingListItem.objects.filter(
+        user=request.user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+    renderer = request.accepted_renderer
+    form = SHOPPING_CART_FORMS[renderer.format]
+    response = StreamingHttpResponse(
+        form(ingredient_total.iterator()),
+        content_type=f'{renderer.media_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart.{renderer.format}"'
     )
 
-    ingredient_total = shopping_cart.values(
-        'recipe__ingredients__name', 'recipe__ingredients__measurement_unit'
-    ).annotate(total_amount=Sum('recipe__recipeingredient__amount'))
+    return response
 
-    content = form_list(ingredient_total)
 
-    response = HttpResponse(content, content_type='text/plain')
-    response['Content-Disposition'] = (
-        'attachment; filename="shopping_cart.txt"'
+@decorators.api_view(['GET'])
+@decorators.permission_classes([permissions.IsAuthenticated])
+def shopping_cart_summary_view(request):
+    return conditional_response(
+        request,
+        ('recipes', 'ingredients'),
+        lambda: Response(ShoppingListItemSerializer(
+            ShoppingListItem.objects.filter(
+                user=request.user
+            ).select_related('ingredient').order_by('ingredient'),
+            many=True
+        ).data),
+        per_user=True
     )
 
-    return response
+
+@decorators.api_view(['GET'])
+@decorators.permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(
+        request_metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE
+    )
@@ -0,0 +1,123 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .response_cache import cached_response, normalized_path
+
+VERSION_KEY = 'version:{}'
+USER_SCOPE = 'user:{}'
+RECIPE_SCOPE = 'recipe:{}'
+AUTHOR_SCOPE = 'author:{}'
+
+
+def bump_versions(*scopes, using='default'):
+    """Mark every cached representation of the given scopes as stale."""
+    now = time.time()
+    caches[using].set_many(
+        {VERSION_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def get_versions(scopes, using='default'):
+    cache = caches[using]
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions[key] for key in keys]
+
+
+def get_validators(request, scopes, per_user=False):
+    """Build an ETag and Last-Modified time for a GET request.
+
+    The ETag covers the normalized path, the scope versions and, for
+    authenticated users of per-user views, the user's own state version.
+    """
+    scopes = list(scopes)
+    user = request.user
+    if per_user and user.is_authenticated:
+        scopes.append(USER_SCOPE.format(user.id))
+    versions = get_versions(scopes)
+    parts = [normalized_path(request), str(user.id)]
+    parts.extend(repr(version) for version in versions)
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'"{digest}"', max(versions)
+
+
+def stable_last_modified(version):
+    """Return the Last-Modified time of a version, once it can be trusted.
+
+    HTTP dates have whole seconds: a change later in the same second would
+    carry the same date and an If-Modified-Since check would miss it. So
+    the date is only used after its second is over, until then the ETag
+    alone validates.
+    """
+    last_modified = int(version)
+    if last_modified < int(time.time()):
+        return last_modified
+    return None
+
+
+def conditional_response(request, scopes, handler, per_user=False,
+                         cache_anonymous=False):
+    """Answer with 304 when the client's copy is current, else run handler.
+
+    With ``cache_anonymous`` anonymous responses are shared through the
+    response cache; a stale cached response keeps its own validators.
+    """
+    etag, version = get_validators(request, scopes, per_user)
+    last_modified = stable_last_modified(version)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if last_modified is not None:
+        last_modified = http_date(last_modified)
+    if response is None:
+        if cache_anonymous and request.user.is_anonymous:
+            response = cached_response(
+                request, etag, last_modified, handler
+            )
+        else:
+            response = handler()
+    response.setdefault('ETag', etag)
+    if last_modified is not None and response['ETag'] == etag:
+        # A stale cached response may have been stored without a date;
+        # the current one would claim content it does not contain.
+        response.setdefault('Last-Modified', last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalGetMixin:
+    """Serve list and retrieve with ETag/Last-Modified validators."""
+    validator_scopes = ()
+    per_user_validator = False
+    cache_anonymous = False
+
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            self.validator_scopes,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ),
+            self.per_user_validator,
+            self.cache_anonymous
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            self.validator_scopes,
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+            self.per_user_validator,
+            self.cache_anonymous
+        )
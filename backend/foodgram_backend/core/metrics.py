@@ -0,0 +1,238 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+
+
+class RequestTimings:
+    """Time spent by one request in the database, view, serializers and
+    rendering. The database and serializer phases overlap the view."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.view = None
+        self.serialize = None
+        self.render = None
+        self.total = None
+        self.view_started = None
+        self.render_started = None
+
+    def time_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def phases(self):
+        for phase in ('db', 'view', 'serialize', 'render', 'total'):
+            seconds = getattr(self, phase)
+            if seconds is not None:
+                yield phase, seconds
+
+    def header(self):
+        entries = []
+        for phase, seconds in self.phases():
+            entry = f'{phase};dur={seconds * 1000:.1f}'
+            if phase == 'db':
+                entry += f';desc="{self.queries} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+def current_timings():
+    return getattr(_local, 'timings', None)
+
+
+class TimedSerializer:
+    """Wrap a serializer, adding the time spent in ``data`` to the request's
+    serialize phase. Everything else goes to the wrapped serializer."""
+
+    def __init__(self, serializer):
+        self.__dict__['serializer'] = serializer
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.serializer, name, value)
+
+    @property
+    def data(self):
+        timings = current_timings()
+        if timings is None:
+            return self.serializer.data
+        started = time.perf_counter()
+        try:
+            return self.serializer.data
+        finally:
+            timings.serialize = (timings.serialize or 0) + (
+                time.perf_counter() - started
+            )
+
+
+class SerializerTimingMixin:
+    """Report the serializers of a generic view in ``Server-Timing``."""
+
+    def get_serializer(self, *args, **kwargs):
+        return TimedSerializer(super().get_serializer(*args, **kwargs))
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    return ','.join(f'{name}="{escape(value)}"' for name, value in pairs)
+
+
+class RequestMetrics:
+    """Per-route request histograms and counters of this process."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._requests = defaultdict(int)
+        self._queries = defaultdict(int)
+
+    def record(self, route, method, status, timings):
+        with self._lock:
+            self._requests[route, method, status] += 1
+            self._queries[route, method] += timings.queries
+            for phase, seconds in timings.phases():
+                series = self._durations.setdefault(
+                    (route, method, phase), [0] * (len(self.buckets) + 2)
+                )
+                series[bisect_left(self.buckets, seconds)] += 1
+                series[-1] += seconds
+
+    def render(self):
+        """Return all series in the Prometheus text exposition format."""
+        with self._lock:
+            durations = {
+                labels: list(series)
+                for labels, series in self._durations.items()
+            }
+            requests = dict(self._requests)
+            queries = dict(self._queries)
+        lines = [
+            '# HELP foodgram_requests_total Requests served.',
+            '# TYPE foodgram_requests_total counter',
+        ]
+        names = ('route', 'method', 'status')
+        for labels, count in sorted(requests.items()):
+            lines.append(
+                f'foodgram_requests_total{{{format_labels(names, labels)}}} '
+                f'{count}'
+            )
+        lines += [
+            '# HELP foodgram_db_queries_total SQL queries run by requests.',
+            '# TYPE foodgram_db_queries_total counter',
+        ]
+        names = ('route', 'method')
+        for labels, count in sorted(queries.items()):
+            lines.append(
+                f'foodgram_db_queries_total{{{format_labels(names, labels)}}} '
+                f'{count}'
+            )
+        lines += [
+            '# HELP foodgram_request_duration_seconds Time spent per request '
+            'phase.',
+            '# TYPE foodgram_request_duration_seconds histogram',
+        ]
+        names = ('route', 'method', 'phase')
+        metric = 'foodgram_request_duration_seconds'
+        for labels, series in sorted(durations.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket'
+                    f'{{{format_labels(names, labels, le=bound)}}} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{metric}_sum{{{format_labels(names, labels)}}} '
+                f'{series[-1]}'
+            )
+            lines.append(
+                f'{metric}_count{{{format_labels(names, labels)}}} '
+                f'{cumulative}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class ServerTimingMiddleware:
+    """Measure every request and add it to the per-route histograms of
+    ``request_metrics``. The ``Server-Timing`` header is only sent to
+    staff users, or to everyone with ``DEBUG`` on.
+
+    Routes are labelled by their URL name, or by the route pattern for
+    unnamed URLs.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        _local.timings = timings
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.time_query):
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        finished = time.perf_counter()
+        timings.total = finished - started
+        if timings.view_started is not None and timings.view is None:
+            timings.view = finished - timings.view_started
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or getattr(user, 'is_staff', False):
+            response['Server-Timing'] = timings.header()
+        match = request.resolver_match
+        if match is None:
+            route = 'unmatched'
+        else:
+            route = match.view_name if match.url_name else match.route
+        request_metrics.record(
+            route, request.method, str(response.status_code), timings
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = current_timings()
+        if timings is None or timings.view_started is None:
+            return response
+        now = time.perf_counter()
+        timings.view = now - timings.view_started
+        timings.render_started = now
+
+        def rendered(response):
+            timings.render = time.perf_counter() - timings.render_started
+
+        response.add_post_render_callback(rendered)
+        return response
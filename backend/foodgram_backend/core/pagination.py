@@ -1,6 +1,97 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
+    """Page/limit pagination with an opt-in keyset mode.
+
+    Views that declare ``cursor_ordering`` also accept ``?cursor=``. An
+    empty cursor returns the first page, and every page links to the next
+    one through an opaque cursor built from the ordering fields of its last
+    item, so deep pages cost the same as the first and need no COUNT.
+    """
     page_size_query_param = 'limit'
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    cursor_page_size = 6
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', None)
+        self.cursor_mode = (
+            self.ordering is not None
+            and self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request) or self.cursor_page_size
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param], queryset.model
+        )
+        if position:
+            queryset = queryset.filter(self.get_after_filter(position))
+        items = list(queryset[:page_size + 1])
+        self.has_next = len(items) > page_size
+        self.cursor_items = items[:page_size]
+        return self.cursor_items
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data
+        })
+
+    def get_after_filter(self, position):
+        equal = {}
+        conditions = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+            equal[name] = value
+        return reduce(or_, conditions)
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        last = self.cursor_items[-1]
+        position = []
+        for field in self.ordering:
+            value = getattr(last, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(position).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, cursor, model):
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+IGNORED = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT')
+NORMALIZERS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+EXCLUDED_PATHS = (os.path.dirname(__file__), 'site-packages')
+PLAN_VENDORS = ('sqlite', 'postgresql')
+
+
+class RepeatedQueriesError(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """Reduce a statement to its template, or None for transaction control.
+
+    Literals and placeholders become ``?`` and value lists collapse, so the
+    per-row queries of an N+1 pattern share one fingerprint.
+    """
+    sql = sql.strip()
+    if sql.upper().startswith(IGNORED):
+        return None
+    for pattern, replacement in NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def find_origin():
+    """Describe where the current query came from.
+
+    Returns the innermost serializer field being rendered, if any, and the
+    innermost frame of project code.
+    """
+    field = None
+    location = None
+    frame = sys._getframe(1)
+    while frame is not None and (field is None or location is None):
+        code = frame.f_code
+        if field is None and code.co_name == 'to_representation':
+            serializer = frame.f_locals.get('self')
+            current = frame.f_locals.get('field')
+            if isinstance(serializer, Serializer) and current is not None:
+                field = f'{type(serializer).__name__}.{current.field_name}'
+        if location is None and code.co_filename.startswith(
+            settings.BASE_DIR
+        ) and not any(
+            path in code.co_filename for path in EXCLUDED_PATHS
+        ):
+            location = (
+                f'{os.path.relpath(code.co_filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno} in {code.co_name}'
+            )
+        frame = frame.f_back
+    return field, location
+
+
+class RepeatedQueryDetector:
+    """Execute wrapper counting statements per fingerprint."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        if key is not None:
+            self.counts[key] += 1
+            if self.counts[key] == self.threshold + 1:
+                self.origins[key] = find_origin()
+        return execute(sql, params, many, context)
+
+    def problems(self):
+        result = []
+        for key, (field, location) in self.origins.items():
+            source = ' via '.join(
+                part for part in (field, location) if part
+            ) or 'unknown origin'
+            result.append(
+                f'{self.counts[key]} queries from {source}: {key}'
+            )
+        return result
+
+    def check(self, strict, context=''):
+        problems = self.problems()
+        if not problems:
+            return
+        message = (
+            f'{context or "Block"} repeated a query template more than '
+            f'{self.threshold} times:\n' + '\n'.join(problems)
+        )
+        if strict:
+            raise RepeatedQueriesError(message)
+        logger.warning(message)
+
+
+class QueryRecorder:
+    """Execute wrapper keeping the SQL and parameters of every statement."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and fingerprint(sql) is not None:
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def sqlite_plan_problems(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        details = [row[-1] for row in cursor.fetchall()]
+    tables = set(connection.introspection.table_names())
+    problems = []
+    for detail in details:
+        words = detail.replace(' TABLE ', ' ').split()
+        if words[0] == 'SCAN' and not {'USING', 'VIRTUAL'} & set(words):
+            # Scans of derived tables and constant rows are not reported.
+            if words[1] in tables:
+                problems.append(f'sequential scan of {words[1]}')
+        elif detail.startswith('USE TEMP B-TREE'):
+            problems.append(f'sort without index ({detail[16:].lower()})')
+    return problems
+
+
+def postgresql_plan_problems(sql, params):
+    # With sequential scans and sorts disabled the planner only keeps
+    # those for which no index is available.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('SET LOCAL enable_sort = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    problems = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            problems.append(f"sequential scan of {node['Relation Name']}")
+        elif node['Node Type'] == 'Sort':
+            problems.append(
+                f"sort without index ({', '.join(node['Sort Key'])})"
+            )
+        nodes.extend(node.get('Plans', ()))
+    return problems
+
+
+def plan_problems(sql, params):
+    """List the sequential scans and unindexed sorts in a query's plan.
+
+    Only vendors in ``PLAN_VENDORS`` are supported.
+    """
+    if connection.vendor == 'sqlite':
+        return sqlite_plan_problems(sql, params)
+    if connection.vendor == 'postgresql':
+        return postgresql_plan_problems(sql, params)
+    raise NotImplementedError(
+        f'EXPLAIN is not supported on {connection.vendor}.'
+    )
+
+
+@contextmanager
+def detect_repeated_queries(threshold=None, strict=True):
+    """Fail (or warn) when the block repeats a query template too often.
+
+    Meant for tests::
+
+        with detect_repeated_queries():
+            client.get('/api/recipes/')
+    """
+    detector = RepeatedQueryDetector(
+        threshold or settings.QUERY_REPEAT_THRESHOLD
+    )
+    with connection.execute_wrapper(detector):
+        yield detector
+    detector.check(strict)
+
+
+class RepeatedQueryMiddleware:
+    """Check every request when ``QUERY_DETECTOR`` is ``warn`` or ``strict``.
+
+    ``warn`` logs the offending templates, ``strict`` raises
+    ``RepeatedQueriesError`` so the request fails.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.QUERY_DETECTOR
+        if not mode:
+            return self.get_response(request)
+        detector = RepeatedQueryDetector(settings.QUERY_REPEAT_THRESHOLD)
+        with connection.execute_wrapper(detector):
+            response = self.get_response(request)
+        detector.check(mode == 'strict', f'{request.method} {request.path}')
+        return response
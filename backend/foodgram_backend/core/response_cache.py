@@ -0,0 +1,69 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+CACHE_KEY = 'response:{}'
+LOCK_KEY = 'response_lock:{}'
+
+
+def normalized_path(request):
+    """Return the request path with its query parameters sorted."""
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values
+    )
+    if not params:
+        return request.path
+    return f'{request.path}?{urlencode(params)}'
+
+
+def cached_response(request, etag, last_modified, handler):
+    """Serve a GET from the shared cache, keyed on the normalized URL.
+
+    Entries remember the ETag they were built under. The ETag covers the
+    scope versions, so a version bump makes the entry stale. Only the
+    worker that takes the refresh lock recomputes a stale entry; the
+    others keep serving it, with its own validators, in the meantime.
+    """
+    key = hashlib.md5(
+        request.build_absolute_uri(normalized_path(request)).encode()
+    ).hexdigest()
+    entry = cache.get(CACHE_KEY.format(key))
+    if entry is not None:
+        if entry['etag'] == etag:
+            return entry_response(entry, 'HIT')
+        if not cache.add(
+            LOCK_KEY.format(key), True, settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        ):
+            return entry_response(entry, 'STALE')
+    try:
+        response = handler()
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(
+                CACHE_KEY.format(key),
+                {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'data': response.data
+                },
+                settings.RESPONSE_CACHE_TIMEOUT
+            )
+    finally:
+        if entry is not None:
+            cache.delete(LOCK_KEY.format(key))
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def entry_response(entry, state):
+    response = Response(entry['data'], headers={
+        'ETag': entry['etag'],
+        'X-Cache': state
+    })
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = entry['last_modified']
+    return response
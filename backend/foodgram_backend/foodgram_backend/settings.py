@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.ServerTimingMiddleware',
+    'core.queries.RepeatedQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +80,38 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    },
+    # Recipe fragments and their versions live apart from shared state.
+    'fragments': {
+        'BACKEND': os.getenv(
+            'FRAGMENT_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'FRAGMENT_CACHE_LOCATION', default='foodgram-fragments'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # The pantry change log, sized well above PANTRY_CHANGE_LOG_SIZE.
+    'pantry': {
+        'BACKEND': os.getenv(
+            'PANTRY_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'PANTRY_CACHE_LOCATION', default='foodgram-pantry'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -113,7 +147,7 @@ USE_TZ = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -137,3 +171,26 @@ USER_CHAR_LENGTH = 150
 FIRST_NAME_LENGTH = 150
 LAST_NAME_LENGTH = 150
 PASSWORD_LENGTH = 150
+INGREDIENT_SEARCH_LIMIT = 50
+RECIPE_STATE_CACHE_TIMEOUT = 5 * 60
+RECIPE_FRAGMENT_TIMEOUT = 24 * 60 * 60
+# Build list responses with api.fast_serializers instead of DRF fields.
+FAST_READ_SERIALIZERS = True
+RECIPE_BATCH_LIMIT = 100
+SUBSCRIPTION_RECIPES_LIMIT = 20
+RECIPE_IMAGE_SIZES = {
+    'card': (600, 600),
+    'thumbnail': (200, 200),
+}
+RECIPE_IMAGE_QUALITY = 85
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 5 * 60
+SEARCH_CONFIG = 'russian'
+PANTRY_RESULTS_LIMIT = 20
+PANTRY_CHANGE_LOG_SIZE = 1000
+PANTRY_CHANGE_LOG_TIMEOUT = 60 * 60
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_LOCK_TIMEOUT = 30
+# '' (off), 'warn' (log) or 'strict' (raise) on repeated query templates.
+QUERY_DETECTOR = os.getenv('QUERY_DETECTOR', '')
+QUERY_REPEAT_THRESHOLD = 5
@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Count, Q
 
 from .models import (
     Ingredient,
@@ -23,18 +22,7 @@ class IngredientAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'favorite_count')
     list_filter = ('author', 'name', 'tags')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(favorite_count=Count(
-            'recipe_user', filter=Q(recipe_user__is_favorited=True)
-        ))
-        return queryset
-
-    def favorite_count(self, obj):
-        return obj.favorite_count
-
-    favorite_count.short_description = 'In favorite, times'
+    readonly_fields = ('favorite_count',)
 
 
 class RecipeTagAdmin(admin.ModelAdmin):
@@ -0,0 +1,63 @@
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+# (app, model, counter field, counted app, counted model, foreign key, filter)
+COUNTERS = (
+    (
+        'recipes', 'Recipe', 'favorite_count',
+        'recipes', 'RecipeUser', 'recipe', {'is_favorited': True}
+    ),
+    ('users', 'User', 'recipe_count', 'recipes', 'Recipe', 'author', {}),
+    (
+        'users', 'User', 'subscriber_count',
+        'users', 'Subscription', 'author', {}
+    ),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Add ``delta`` to a stored counter in the database, never below zero.
+
+    Call it inside the transaction of the write it accounts for.
+    """
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def rebuild_counters(apps=global_apps, batch_size=1000):
+    """Recount every stored counter from its source rows.
+
+    Each batch is one UPDATE of ``batch_size`` rows by primary key range.
+    Returns the number of rows whose counter changed, per counter field.
+    """
+    changed = {}
+    for (app, model_name, field, counted_app, counted_name, key,
+         filters) in COUNTERS:
+        model = apps.get_model(app, model_name)
+        counted = apps.get_model(counted_app, counted_name)
+        count = Coalesce(Subquery(
+            counted.objects.filter(**{key: OuterRef('pk')}, **filters)
+            .order_by().values(key).annotate(total=Count('pk'))
+            .values('total')
+        ), Value(0))
+        changed[field] = 0
+        start = 0
+        while True:
+            ids = list(model.objects.filter(pk__gt=start).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            batch = model.objects.filter(pk__gte=ids[0], pk__lte=ids[-1])
+            changed[field] += batch.annotate(actual=count).exclude(
+                **{field: F('actual')}
+            ).count()
+            batch.update(**{field: count})
+            start = ids[-1]
+    return changed
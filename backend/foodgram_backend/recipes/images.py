@@ -0,0 +1,76 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+IMAGE_DIR = 'recipes/images/'
+VARIANT_FORMATS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+
+def variant_name(name, size, image_format):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{size}.{VARIANT_FORMATS[image_format]}'
+
+
+def variant_names(name):
+    return {
+        size: {
+            image_format: variant_name(name, size, image_format)
+            for image_format in VARIANT_FORMATS
+        }
+        for size in settings.RECIPE_IMAGE_SIZES
+    }
+
+
+def to_rgb(image):
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.split()[-1])
+    return background
+
+
+def save_variants(name, content):
+    """Store the card and thumbnail derivatives of an image."""
+    image = to_rgb(Image.open(io.BytesIO(content)))
+    for size, bounds in settings.RECIPE_IMAGE_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail(bounds)
+        for image_format in VARIANT_FORMATS:
+            path = variant_name(name, size, image_format)
+            if default_storage.exists(path):
+                continue
+            buffer = io.BytesIO()
+            variant.save(
+                buffer,
+                image_format.upper(),
+                quality=settings.RECIPE_IMAGE_QUALITY
+            )
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def store_image(name, content):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+        save_variants(name, content)
+
+
+def save_recipe_image(image):
+    """Store an uploaded image under its content hash and return its name.
+
+    Identical uploads map to the same name, so the original and its
+    derivatives are written only once. Nothing is written until the
+    current transaction commits, so a rolled back save leaves no files.
+    """
+    image.seek(0)
+    content = image.read()
+    extension = os.path.splitext(image.name)[1].lower()
+    name = f'{IMAGE_DIR}{hashlib.sha256(content).hexdigest()}{extension}'
+    transaction.on_commit(lambda: store_image(name, content))
+    return name
@@ -0,0 +1,81 @@
+import threading
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Ingredient
+
+VERSION_KEY = 'ingredient_index_version'
+
+
+def fold(value):
+    return value.lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """In-process prefix/substring index over Ingredient.name.
+
+    The index is rebuilt lazily whenever the version stored in the cache
+    changes, so every worker sharing the cache picks up edits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = []
+        self._entries = []
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = sorted(
+                (fold(name), id, name, measurement_unit)
+                for id, name, measurement_unit
+                in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            self._keys = [row[0] for row in rows]
+            self._entries = [
+                {'id': id, 'name': name, 'measurement_unit': unit}
+                for _, id, name, unit in rows
+            ]
+            self._version = version
+
+    def search(self, query, limit):
+        self._ensure_fresh()
+        keys = self._keys
+        entries = self._entries
+        query = fold(query.strip())
+        if not query:
+            return entries[:limit]
+        result = []
+        index = bisect_left(keys, query)
+        while (
+            index < len(keys)
+            and keys[index].startswith(query)
+            and len(result) < limit
+        ):
+            result.append(entries[index])
+            index += 1
+        if len(result) < limit:
+            for key, entry in zip(keys, entries):
+                if query in key and not key.startswith(query):
+                    result.append(entry)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
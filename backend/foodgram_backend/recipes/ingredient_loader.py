@@ -0,0 +1,71 @@
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+
+LoadResult = namedtuple(
+    'LoadResult',
+    ('read', 'skipped', 'duplicates', 'existing', 'created', 'new', 'seconds')
+)
+
+
+def read_rows(path):
+    """Yield (name, measurement_unit) pairs from a CSV or JSON file.
+
+    CSV files hold one ``name,measurement_unit`` pair per line and are read
+    lazily. JSON files hold a list of objects with the same two keys.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8') as file:
+        if extension == '.json':
+            for item in json.load(file):
+                yield item.get('name'), item.get('measurement_unit')
+        else:
+            for row in csv.reader(file):
+                yield tuple(row[:2]) if len(row) >= 2 else (None, None)
+
+
+def load_ingredients(model, rows, batch_size=1000, dry_run=False):
+    """Insert ingredients that are not stored yet with batched bulk_create.
+
+    Rows are deduplicated on (name, measurement_unit) against the file and
+    the table, so loading the same catalog twice creates nothing. With
+    ``dry_run`` nothing is written and ``new`` lists the missing pairs.
+    """
+    started = time.perf_counter()
+    stored = set(model.objects.values_list('name', 'measurement_unit'))
+    loaded = set()
+    read = skipped = duplicates = existing = created = 0
+    new = []
+    batch = []
+    for name, measurement_unit in rows:
+        read += 1
+        name = (name or '').strip()
+        measurement_unit = (measurement_unit or '').strip()
+        if not name or not measurement_unit:
+            skipped += 1
+            continue
+        key = (name, measurement_unit)
+        if key in stored:
+            existing += 1
+            continue
+        if key in loaded:
+            duplicates += 1
+            continue
+        loaded.add(key)
+        if dry_run:
+            new.append(key)
+            continue
+        batch.append(model(name=name, measurement_unit=measurement_unit))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return LoadResult(
+        read, skipped, duplicates, existing, created, new,
+        time.perf_counter() - started
+    )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.recipe_state import compact_recipe_users
+
+
+class Command(BaseCommand):
+    help = 'Delete favorite and shopping cart rows that carry no flag.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows scanned per DELETE statement.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        deleted = compact_recipe_users(batch_size=options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} rows without flags.')
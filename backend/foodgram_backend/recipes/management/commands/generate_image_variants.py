@@ -0,0 +1,30 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.images import save_variants, variant_names
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Create missing card and thumbnail variants of recipe images.'
+
+    def handle(self, *args, **options):
+        created = 0
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        for name in names.iterator():
+            variants = [
+                path
+                for formats in variant_names(name).values()
+                for path in formats.values()
+            ]
+            if all(default_storage.exists(path) for path in variants):
+                continue
+            if not default_storage.exists(name):
+                self.stderr.write(f'Missing original: {name}')
+                continue
+            with default_storage.open(name) as file:
+                save_variants(name, file.read())
+            created += 1
+        self.stdout.write(f'Generated variants for {created} images.')
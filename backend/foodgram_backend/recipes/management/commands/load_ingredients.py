@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.conditional import bump_versions
+from recipes.ingredient_index import ingredient_index
+from recipes.ingredient_loader import load_ingredients, read_rows
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Load ingredients from a CSV or JSON file in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file to load.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per INSERT statement.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the ingredients that would be added and write nothing.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            with transaction.atomic():
+                result = load_ingredients(
+                    Ingredient,
+                    read_rows(options['path']),
+                    options['batch_size'],
+                    options['dry_run']
+                )
+                if result.created:
+                    # bulk_create sends no post_save, so do the signal work.
+                    transaction.on_commit(ingredient_index.invalidate)
+                    transaction.on_commit(
+                        lambda: bump_versions('ingredients', 'recipes')
+                    )
+        except (OSError, ValueError, AttributeError) as error:
+            raise CommandError(f'Cannot load {options["path"]}: {error}')
+        for name, measurement_unit in result.new:
+            self.stdout.write(f'+ {name}, {measurement_unit}')
+        rate = result.read / result.seconds if result.seconds else 0
+        if options['dry_run']:
+            summary = f'{len(result.new)} to create'
+        else:
+            summary = f'{result.created} created'
+        self.stdout.write(
+            f'Read {result.read} rows in {result.seconds:.2f} s '
+            f'({rate:.0f} rows/s): {summary}, '
+            f'{result.existing} already stored, '
+            f'{result.duplicates} duplicates, {result.skipped} invalid.'
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount stored favorite, recipe and subscriber counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows recounted per UPDATE statement.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        changed = rebuild_counters(batch_size=options['batch_size'])
+        for field, count in changed.items():
+            self.stdout.write(f'{field}: fixed {count} rows.')
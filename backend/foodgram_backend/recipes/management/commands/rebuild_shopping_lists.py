@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored shopping lists from the carts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Users checked per batch.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        fixed = rebuild_shopping_lists(batch_size=options['batch_size'])
+        self.stdout.write(f'Fixed the shopping lists of {fixed} users.')
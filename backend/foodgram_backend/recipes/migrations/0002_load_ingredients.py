@@ -2,18 +2,30 @@
 import csv
 import os
 
+from django.conf import settings
 from django.db import migrations
 
+BATCH_SIZE = 1000
+
 
 def load_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    file_path = os.path.join('fixtures', 'ingredients.csv')
+    file_path = os.path.join(settings.BASE_DIR, 'fixtures', 'ingredients.csv')
+    stored = set(Ingredient.objects.values_list('name', 'measurement_unit'))
+    batch = []
     with open(file_path, encoding='utf-8') as file:
-        reader = csv.reader(file)
-        for name, measurement_unit in reader:
-            Ingredient.objects.get_or_create(
-                name=name, measurement_unit=measurement_unit
-            )
+        for row in csv.reader(file):
+            if len(row) < 2:
+                continue
+            key = (row[0].strip(), row[1].strip())
+            if not all(key) or key in stored:
+                continue
+            stored.add(key)
+            batch.append(Ingredient(name=key[0], measurement_unit=key[1]))
+            if len(batch) >= BATCH_SIZE:
+                Ingredient.objects.bulk_create(batch)
+                batch = []
+    Ingredient.objects.bulk_create(batch)
 
 
 class Migration(migrations.Migration):
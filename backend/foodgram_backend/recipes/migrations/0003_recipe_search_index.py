@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import migrations
+
+# PostgreSQL gets a tsvector column with a GIN index, SQLite an FTS5 table
+# keyed by recipe id. Other databases search with icontains and need none.
+POSTGRESQL_CREATE = (
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    'CREATE INDEX recipes_recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+POSTGRESQL_FILL = (
+    "UPDATE recipes_recipe SET search_vector = "
+    "setweight(to_tsvector(%s, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector(%s, coalesce(text, '')), 'B')"
+)
+POSTGRESQL_DROP = 'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+SQLITE_CREATE = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(name, text)',
+)
+SQLITE_FILL = (
+    'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+    'SELECT id, name, text FROM recipes_recipe'
+)
+SQLITE_DROP = 'DROP TABLE recipes_recipe_fts'
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_CREATE:
+            schema_editor.execute(statement)
+        config = settings.SEARCH_CONFIG
+        schema_editor.execute(POSTGRESQL_FILL, [config, config])
+    elif vendor == 'sqlite':
+        for statement in SQLITE_CREATE:
+            schema_editor.execute(statement)
+        schema_editor.execute(SQLITE_FILL)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_DROP)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_load_ingredients'),
+    ]
+
+    operations = [migrations.RunPython(create_index, drop_index)]
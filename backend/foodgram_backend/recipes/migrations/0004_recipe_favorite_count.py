@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# (app, model, counter field, counted app, counted model, foreign key, filter)
+COUNTERS = (
+    (
+        'recipes', 'Recipe', 'favorite_count',
+        'recipes', 'RecipeUser', 'recipe', {'is_favorited': True}
+    ),
+    ('users', 'User', 'recipe_count', 'recipes', 'Recipe', 'author', {}),
+    (
+        'users', 'User', 'subscriber_count',
+        'users', 'Subscription', 'author', {}
+    ),
+)
+BATCH_SIZE = 1000
+
+
+def fill_counters(apps, schema_editor):
+    for (app, model_name, field, counted_app, counted_name, key,
+         filters) in COUNTERS:
+        model = apps.get_model(app, model_name)
+        counted = apps.get_model(counted_app, counted_name)
+        count = Coalesce(Subquery(
+            counted.objects.filter(**{key: OuterRef('pk')}, **filters)
+            .order_by().values(key).annotate(total=Count('pk'))
+            .values('total')
+        ), Value(0))
+        start = 0
+        while True:
+            ids = list(model.objects.filter(pk__gt=start).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:BATCH_SIZE])
+            if not ids:
+                break
+            model.objects.filter(
+                pk__gte=ids[0], pk__lte=ids[-1]
+            ).update(**{field: count})
+            start = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_search_index'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='In favorite, times'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
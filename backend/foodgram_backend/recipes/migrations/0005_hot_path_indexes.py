@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_favorite_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeuser',
+            index=models.Index(condition=models.Q(is_favorited=True), fields=['user', 'recipe'], name='recipe_user_favorited_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeuser',
+            index=models.Index(condition=models.Q(is_in_shopping_cart=True), fields=['user', 'recipe'], name='recipe_user_cart_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def fill_shopping_lists(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    start = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=start).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, ingredient_id, total in RecipeIngredient.objects.filter(
+                recipe__recipe_user__user_id__in=ids,
+                recipe__recipe_user__is_in_shopping_cart=True
+            ).order_by().values(
+                'recipe__recipe_user__user_id', 'ingredient_id'
+            ).annotate(total=Sum('amount')).values_list(
+                'recipe__recipe_user__user_id', 'ingredient_id', 'total'
+            )
+        )
+        start = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Amount')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.Ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopping_lists, migrations.RunPython.noop
+        ),
+    ]
@@ -3,6 +3,18 @@ import re
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window
+)
+from django.db.models.functions import RowNumber
+
+from users.models import Subscription
 
 User = get_user_model()
 
@@ -59,6 +71,68 @@ class Ingredient(models.Model):
         return self.name
 
 
+def read_authors(user=None):
+    """Users annotated with ``is_subscribed`` for ``user``.
+
+    Without an authenticated user it is always False.
+    """
+    if user is None or user.is_anonymous:
+        return User.objects.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return User.objects.annotate(is_subscribed=Exists(
+        Subscription.objects.filter(author=OuterRef('pk'), subscriber=user)
+    ))
+
+
+def read_lookups(user=None):
+    """Prefetch lookups for RecipeReadSerializer."""
+    return (
+        Prefetch('author', queryset=read_authors(user)),
+        'tags',
+        Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        )
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        recipe_user = RecipeUser.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        )
+        return self.annotate(
+            is_favorited=Exists(recipe_user.filter(is_favorited=True)),
+            is_in_shopping_cart=Exists(
+                recipe_user.filter(is_in_shopping_cart=True)
+            )
+        )
+
+    def latest_by_author(self, author_ids, limit):
+        """Return the ``limit`` newest recipes of every author in one query."""
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()]
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        return sorted(
+            self.raw(
+                f'SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s',
+                (*params, limit)
+            ),
+            key=lambda recipe: recipe.recipe_rank
+        )
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag,
@@ -88,11 +162,25 @@ class Recipe(models.Model):
     text = models.TextField('Text')
     cooking_time = models.PositiveSmallIntegerField('Cooking time')
     pub_date = models.DateTimeField('Publication date', auto_now_add=True)
+    favorite_count = models.PositiveIntegerField(
+        'In favorite, times', default=0, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -144,3 +232,31 @@ class RecipeUser(models.Model):
                 fields=['recipe', 'user'], name='unique_recipe_user'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'],
+                name='recipe_user_favorited_idx',
+                condition=models.Q(is_favorited=True)
+            ),
+            models.Index(
+                fields=['user', 'recipe'],
+                name='recipe_user_cart_idx',
+                condition=models.Q(is_in_shopping_cart=True)
+            )
+        ]
+
+
+class ShoppingListItem(models.Model):
+    """Total amount of an ingredient over the recipes in a user's cart."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    amount = models.PositiveIntegerField('Amount')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='unique_user_ingredient'
+            )
+        ]
@@ -0,0 +1,242 @@
+import random
+import threading
+from collections import defaultdict
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import RecipeIngredient
+
+VERSION_KEY = 'pantry_index_version'
+CHANGE_KEY = 'pantry_index_change:{}'
+
+
+def add_bits(planes, bits):
+    """Add one to the bit-sliced counters of every recipe set in ``bits``."""
+    index = 0
+    while bits:
+        if index == len(planes):
+            planes.append(0)
+        carry = planes[index] & bits
+        planes[index] ^= bits
+        bits = carry
+        index += 1
+
+
+def equal_mask(planes, value, mask):
+    """Narrow ``mask`` to the recipes whose bit-sliced counter is ``value``."""
+    if value >> len(planes):
+        return 0
+    for index, plane in enumerate(planes):
+        mask &= plane if value >> index & 1 else ~plane
+        if not mask:
+            break
+    return mask
+
+
+def rank(pair):
+    count, total = pair
+    return -count / total, total - count
+
+
+def set_counter(planes, recipe_id, value):
+    bit = 1 << recipe_id
+    planes = [plane & ~bit for plane in planes]
+    index = 0
+    while value:
+        if index == len(planes):
+            planes.append(0)
+        if value & 1:
+            planes[index] |= bit
+        value >>= 1
+        index += 1
+    return planes
+
+
+class PantryIndex:
+    """In-process inverted index from ingredient id to recipe ids.
+
+    Each ingredient maps to a bitset (a Python int with bit ``n`` set for
+    recipe ``n``), and the ingredient count of every recipe is kept as
+    bit-sliced planes, so matching a pantry is a few whole-bitset
+    operations instead of a loop over recipes. Writers log each changed
+    recipe under a new version number in the ``pantry`` cache; a worker
+    that falls behind reloads only those recipes, and rebuilds from
+    scratch when the log no longer reaches back to its own version.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._bitsets = {}
+        self._totals = []
+        self._recipes = {}
+
+    def _next_version(self):
+        try:
+            return caches['pantry'].incr(VERSION_KEY)
+        except ValueError:
+            caches['pantry'].add(VERSION_KEY, random.randrange(1 << 48), None)
+            return caches['pantry'].incr(VERSION_KEY)
+
+    def mark_changed(self, recipe_id):
+        caches['pantry'].set(
+            CHANGE_KEY.format(self._next_version()),
+            recipe_id,
+            settings.PANTRY_CHANGE_LOG_TIMEOUT
+        )
+
+    def invalidate(self):
+        # A version without a logged change forces a full rebuild.
+        self._next_version()
+
+    def refresh(self):
+        """Bring the index up to date now rather than on the next match."""
+        self._ensure_fresh()
+
+    def _changed_since(self, version):
+        if self._version is None:
+            return None
+        lag = version - self._version
+        if not 0 < lag <= settings.PANTRY_CHANGE_LOG_SIZE:
+            return None
+        keys = [
+            CHANGE_KEY.format(number)
+            for number in range(self._version + 1, version + 1)
+        ]
+        changes = caches['pantry'].get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return set(changes.values())
+
+    def _ensure_fresh(self):
+        version = caches['pantry'].get(VERSION_KEY)
+        if version is None:
+            version = self._next_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            changed = self._changed_since(version)
+            if changed is None:
+                self._rebuild()
+            else:
+                self._reload(changed)
+            self._version = version
+
+    def _rebuild(self):
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator():
+            recipes[recipe_id].append(ingredient_id)
+        size = max(recipes, default=0) // 8 + 1
+        ingredient_bytes = defaultdict(lambda: bytearray(size))
+        total_bytes = defaultdict(lambda: bytearray(size))
+        for recipe_id, ingredients in recipes.items():
+            byte, bit = recipe_id >> 3, 1 << (recipe_id & 7)
+            for ingredient_id in ingredients:
+                ingredient_bytes[ingredient_id][byte] |= bit
+            total = len(ingredients)
+            index = 0
+            while total:
+                if total & 1:
+                    total_bytes[index][byte] |= bit
+                total >>= 1
+                index += 1
+        self._recipes = {
+            recipe_id: frozenset(ingredients)
+            for recipe_id, ingredients in recipes.items()
+        }
+        self._bitsets = {
+            ingredient_id: int.from_bytes(bits, 'little')
+            for ingredient_id, bits in ingredient_bytes.items()
+        }
+        self._totals = [
+            int.from_bytes(total_bytes[index], 'little')
+            for index in range(len(total_bytes))
+        ]
+
+    def _reload(self, recipe_ids):
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        totals = self._totals
+        for recipe_id in recipe_ids:
+            old = self._recipes.get(recipe_id, frozenset())
+            new = frozenset(current.get(recipe_id, ()))
+            bit = 1 << recipe_id
+            for ingredient_id in new - old:
+                self._bitsets[ingredient_id] = (
+                    self._bitsets.get(ingredient_id, 0) | bit
+                )
+            for ingredient_id in old - new:
+                bits = self._bitsets[ingredient_id] & ~bit
+                if bits:
+                    self._bitsets[ingredient_id] = bits
+                else:
+                    del self._bitsets[ingredient_id]
+            totals = set_counter(totals, recipe_id, len(new))
+            if new:
+                self._recipes[recipe_id] = new
+            else:
+                self._recipes.pop(recipe_id, None)
+        self._totals = totals
+
+    def match(self, ingredient_ids, limit, max_missing=None):
+        """Return the ``limit`` recipes best covered by the ingredients.
+
+        Results are ``(recipe_id, coverage, missing)`` tuples ordered by
+        the share of the recipe's ingredients that are available, then by
+        the number missing, then newest (highest id) first.
+        """
+        self._ensure_fresh()
+        bitsets = self._bitsets
+        totals = self._totals
+        counts = []
+        candidates = 0
+        available = 0
+        for ingredient_id in set(ingredient_ids):
+            bits = bitsets.get(ingredient_id, 0)
+            if bits:
+                candidates |= bits
+                add_bits(counts, bits)
+                available += 1
+        if not candidates:
+            return []
+        pairs = sorted(
+            (
+                (count, total)
+                for total in range(1, 1 << len(totals))
+                for count in range(1, min(total, available) + 1)
+                if max_missing is None or total - count <= max_missing
+            ),
+            key=rank
+        )
+        total_masks = {}
+        result = []
+        # Pairs of equal rank (only full coverage) are merged, so that
+        # their recipes come out newest first together.
+        for (coverage, missing), group in groupby(pairs, key=rank):
+            mask = 0
+            for count, total in group:
+                if total not in total_masks:
+                    total_masks[total] = equal_mask(
+                        totals, total, candidates
+                    )
+                if total_masks[total]:
+                    mask |= equal_mask(counts, count, total_masks[total])
+            while mask and len(result) < limit:
+                recipe_id = mask.bit_length() - 1
+                mask ^= 1 << recipe_id
+                result.append((recipe_id, -coverage, missing))
+            if len(result) == limit:
+                break
+        return result
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .counters import change_counter, change_counters
+from .models import Recipe, RecipeUser
+from .shopping_list import change_cart
+from core.conditional import USER_SCOPE, bump_versions, get_versions
+
+CACHE_KEY = 'recipe_state:{}:{}'
+FIELDS = ('is_favorited', 'is_in_shopping_cart')
+COUNTERS = {'is_favorited': 'favorite_count'}
+CART = 'is_in_shopping_cart'
+# Rows that carry no flag at all, they are deleted instead of kept.
+DEAD = Q(**{field: False for field in FIELDS})
+
+
+def get_recipe_state(user_id):
+    """Return the favorited and in-cart recipe ids of a user.
+
+    The result maps every RecipeUser flag name to a set of recipe ids and
+    is served from the cache, falling back to a single query on a miss.
+    Entries are keyed on the user's state version, which every flag change
+    bumps once it commits, so a stale entry is never read again, even one
+    filled by a request that raced with the change.
+    """
+    version = get_versions([USER_SCOPE.format(user_id)])[0]
+    key = CACHE_KEY.format(user_id, version)
+    state = cache.get(key)
+    if state is None:
+        state = {field: set() for field in FIELDS}
+        rows = RecipeUser.objects.filter(
+            Q(is_favorited=True) | Q(is_in_shopping_cart=True),
+            user_id=user_id
+        ).values_list('recipe_id', *FIELDS)
+        for recipe_id, *flags in rows:
+            for field, flag in zip(FIELDS, flags):
+                if flag:
+                    state[field].add(recipe_id)
+        cache.add(key, state, settings.RECIPE_STATE_CACHE_TIMEOUT)
+    return state
+
+
+def clear_recipe_flag(instance, field):
+    """Clear a flag of a RecipeUser row, deleting the row if none is left.
+
+    Call it in a transaction holding ``select_for_update`` on the row, so
+    that concurrent requests can not clear the same flag twice.
+    """
+    setattr(instance, field, False)
+    if any(getattr(instance, name) for name in FIELDS):
+        instance.save(update_fields=[field])
+    else:
+        instance.delete()
+    if field in COUNTERS:
+        change_counter(Recipe, instance.recipe_id, COUNTERS[field], -1)
+    if field == CART:
+        change_cart(instance.user_id, [instance.recipe_id], -1)
+
+
+@transaction.atomic
+def apply_recipe_flags(user_id, recipe_ids, field, value):
+    """Set or clear a flag on many recipes of one user at once.
+
+    Unknown ids are reported as ``not_found``, recipes whose flag already
+    has the requested value as ``unchanged`` and the rest as ``added`` or
+    ``removed``, as read under a lock on the user's rows. The work is a
+    fixed handful of statements whatever the number of ids; bulk writes
+    send no signals, so the counters, shopping list and the user's state
+    version are updated here. Rows left without any flag are
+    deleted.
+    """
+    found = set(Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', flat=True))
+    if value:
+        # Every row exists before it is read, so that all of them can be
+        # locked; an insert racing with another transaction waits for it.
+        RecipeUser.objects.bulk_create(
+            [
+                RecipeUser(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in found
+            ],
+            ignore_conflicts=True
+        )
+    rows = RecipeUser.objects.filter(user_id=user_id, recipe_id__in=found)
+    current = dict(
+        rows.select_for_update().values_list('recipe_id', field)
+    )
+    changed = {
+        recipe_id for recipe_id, flag in current.items() if flag != value
+    }
+    if changed:
+        rows = rows.filter(recipe_id__in=changed)
+        rows.update(**{field: value})
+        if not value:
+            delete_rows(rows.filter(DEAD))
+        if field in COUNTERS:
+            change_counters(
+                Recipe, changed, COUNTERS[field], 1 if value else -1
+            )
+        if field == CART:
+            change_cart(user_id, changed, 1 if value else -1)
+        transaction.on_commit(
+            lambda: bump_versions(USER_SCOPE.format(user_id))
+        )
+    done = 'added' if value else 'removed'
+    return [
+        {
+            'id': recipe_id,
+            'status': (
+                'not_found' if recipe_id not in found
+                else done if recipe_id in changed
+                else 'unchanged'
+            )
+        }
+        for recipe_id in recipe_ids
+    ]
+
+
+def delete_rows(queryset):
+    """Delete rows with a single DELETE, without loading or signals.
+
+    Only for rows without flags, whose deletion changes no counter and
+    no cached state.
+    """
+    connection = connections[queryset.db]
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    select, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {pk} IN ({select})', params
+        )
+        return cursor.rowcount
+
+
+def compact_recipe_users(batch_size=1000):
+    """Delete every RecipeUser row that carries no flag.
+
+    Each batch is one DELETE of at most ``batch_size`` rows by primary key
+    range, so the table is never locked for long. Returns the number of
+    deleted rows.
+    """
+    deleted = 0
+    start = 0
+    while True:
+        ids = list(RecipeUser.objects.filter(pk__gt=start).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += delete_rows(RecipeUser.objects.filter(
+            DEAD, pk__gte=ids[0], pk__lte=ids[-1]
+        ))
+        start = ids[-1]
+    return deleted
@@ -0,0 +1,104 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+RECIPE_TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+VECTOR_SQL = (
+    "setweight(to_tsvector(%s, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector(%s, coalesce(text, '')), 'B')"
+)
+
+
+def rebuild_search_index(using=connection):
+    config = settings.SEARCH_CONFIG
+    with using.cursor() as cursor:
+        if using.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE {RECIPE_TABLE} SET search_vector = {VECTOR_SQL}',
+                [config, config]
+            )
+        elif using.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM {RECIPE_TABLE}'
+            )
+
+
+def index_recipe(recipe):
+    config = settings.SEARCH_CONFIG
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE {RECIPE_TABLE} SET search_vector = {VECTOR_SQL} '
+                f'WHERE id = %s',
+                [config, config, recipe.id]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.id]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'VALUES (%s, %s, %s)',
+                [recipe.id, recipe.name, recipe.text]
+            )
+
+
+def unindex_recipe(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+
+
+def search_recipes(queryset, query):
+    """Filter recipes by a full-text query and order them by relevance.
+
+    Every word matches as a prefix, on PostgreSQL and SQLite alike.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset
+    if connection.vendor == 'postgresql':
+        tsquery = 'to_tsquery(%s, %s)'
+        params = [
+            settings.SEARCH_CONFIG, ' & '.join(f'{word}:*' for word in words)
+        ]
+        matches = RawSQL(
+            f'{RECIPE_TABLE}.search_vector @@ {tsquery}',
+            params,
+            output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f'ts_rank({RECIPE_TABLE}.search_vector, {tsquery})',
+            params,
+            output_field=FloatField()
+        )
+    elif connection.vendor == 'sqlite':
+        # A join, so that the match runs once for the whole query, in the
+        # same SQL as the other filters. FTS5 ranks better matches lower.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id',
+                f'{FTS_TABLE} MATCH %s'
+            ],
+            params=[' '.join(f'"{word}"*' for word in words)],
+            select={'search_rank': f'-{FTS_TABLE}.rank'}
+        ).order_by('-search_rank', '-pub_date')
+    else:
+        return queryset.filter(reduce(and_, (
+            Q(name__icontains=word) | Q(text__icontains=word)
+            for word in words
+        )))
+    return queryset.annotate(
+        search_match=matches, search_rank=rank
+    ).filter(search_match=True).order_by('-search_rank', '-pub_date')
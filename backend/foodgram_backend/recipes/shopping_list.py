@@ -0,0 +1,156 @@
+"""Per-user shopping lists kept in step with the carts.
+
+``ShoppingListItem`` stores the summed amount of every ingredient of the
+recipes in a user's cart. Cart changes and ingredient edits of carted
+recipes adjust it in their own transaction; writes that bypass these
+functions (bulk loads, the admin) leave drift for
+``rebuild_shopping_lists`` to repair.
+"""
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db.models import (
+    Case,
+    F,
+    PositiveIntegerField,
+    Sum,
+    Value,
+    When
+)
+from django.db.models.functions import Greatest
+
+from .models import RecipeIngredient, RecipeUser, ShoppingListItem
+
+
+def recipe_amounts(recipe_ids, sign=1):
+    """Return the summed amounts of the recipes' ingredients, by id."""
+    return {
+        ingredient_id: sign * total
+        for ingredient_id, total in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total')
+    }
+
+
+def change_shopping_lists(user_ids, deltas):
+    """Add ``deltas`` (amount by ingredient id) to the users' lists.
+
+    At most three statements whatever the number of users and
+    ingredients; items that drop to zero are deleted. Call it inside the
+    transaction of the write it accounts for.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    added = [
+        ingredient_id for ingredient_id, delta in deltas.items() if delta > 0
+    ]
+    if added:
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0
+                )
+                for user_id in user_ids for ingredient_id in added
+            ],
+            ignore_conflicts=True
+        )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(amount=Greatest(
+        F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            default=Value(0)
+        ),
+        Value(0),
+        output_field=PositiveIntegerField()
+    ))
+    if len(added) < len(deltas):
+        items.filter(amount=0).delete()
+
+
+def change_cart(user_id, recipe_ids, sign):
+    """Add (``sign`` 1) or remove (-1) recipes from a user's list."""
+    change_shopping_lists([user_id], recipe_amounts(recipe_ids, sign))
+
+
+def carted_users(recipe_id):
+    return list(RecipeUser.objects.filter(
+        recipe_id=recipe_id, is_in_shopping_cart=True
+    ).values_list('user_id', flat=True))
+
+
+def change_carted_recipe(recipe_id, deltas):
+    """Apply an ingredient change of a recipe to every cart holding it."""
+    change_shopping_lists(carted_users(recipe_id), deltas)
+
+
+def uncart_recipe(recipe_id):
+    """Take a recipe that is about to be deleted out of every list."""
+    user_ids = carted_users(recipe_id)
+    if user_ids:
+        change_shopping_lists(user_ids, recipe_amounts([recipe_id], -1))
+
+
+def rebuild_shopping_lists(apps=global_apps, batch_size=1000):
+    """Recompute every user's shopping list from the carts.
+
+    Users are read in primary key batches of ``batch_size``; only the
+    lists that differ from their carts are rewritten. Returns the number
+    of users whose list was fixed.
+    """
+    user_model = apps.get_model('users', 'User')
+    item_model = apps.get_model('recipes', 'ShoppingListItem')
+    recipe_ingredient_model = apps.get_model('recipes', 'RecipeIngredient')
+    fixed = 0
+    start = 0
+    while True:
+        ids = list(user_model.objects.filter(pk__gt=start).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        expected = defaultdict(dict)
+        for user_id, ingredient_id, total in (
+            recipe_ingredient_model.objects.filter(
+                recipe__recipe_user__user_id__in=ids,
+                recipe__recipe_user__is_in_shopping_cart=True
+            ).order_by().values(
+                'recipe__recipe_user__user_id', 'ingredient_id'
+            ).annotate(total=Sum('amount')).values_list(
+                'recipe__recipe_user__user_id', 'ingredient_id', 'total'
+            )
+        ):
+            expected[user_id][ingredient_id] = total
+        stored = defaultdict(dict)
+        for user_id, ingredient_id, amount in item_model.objects.filter(
+            user_id__in=ids
+        ).values_list('user_id', 'ingredient_id', 'amount'):
+            stored[user_id][ingredient_id] = amount
+        stale = [
+            user_id for user_id in ids
+            if expected.get(user_id, {}) != stored.get(user_id, {})
+        ]
+        if stale:
+            item_model.objects.filter(user_id__in=stale).delete()
+            item_model.objects.bulk_create(
+                item_model(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for user_id in stale
+                for ingredient_id, amount in expected[user_id].items()
+            )
+        fixed += len(stale)
+        start = ids[-1]
+    return fixed
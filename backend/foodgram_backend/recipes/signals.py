@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .counters import change_counter
+from .ingredient_index import ingredient_index
+from .pantry_index import pantry_index
+from .search import index_recipe, unindex_recipe
+from .shopping_list import uncart_recipe
+from .models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    RecipeUser,
+    Tag
+)
+from core.conditional import RECIPE_SCOPE, USER_SCOPE, bump_versions
+from users.models import User
+
+
+def bump_on_commit(*scopes):
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    bump_on_commit('ingredients', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tag_versions(sender, **kwargs):
+    bump_on_commit('tags', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=RecipeTag)
+def bump_recipe_versions(sender, instance, **kwargs):
+    bump_on_commit('recipes')
+    scope = RECIPE_SCOPE.format(
+        instance.id if sender is Recipe else instance.recipe_id
+    )
+    transaction.on_commit(
+        lambda: bump_versions(scope, using='fragments')
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeUser)
+def bump_recipe_user_versions(sender, instance, **kwargs):
+    bump_on_commit(USER_SCOPE.format(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, **kwargs):
+    index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    unindex_recipe(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipe_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipe_count', -1)
+
+
+@receiver(post_delete, sender=RecipeUser)
+def count_deleted_favorite(sender, instance, **kwargs):
+    if instance.is_favorited:
+        change_counter(Recipe, instance.recipe_id, 'favorite_count', -1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncart_deleted_recipe(sender, instance, **kwargs):
+    # Before the delete, while the ingredients and carts still exist.
+    uncart_recipe(instance.id)
+
+
+@receiver(post_delete, sender=Ingredient)
+def invalidate_pantry_index(sender, **kwargs):
+    transaction.on_commit(pantry_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def mark_pantry_recipe(sender, instance, **kwargs):
+    recipe_id = instance.id if sender is Recipe else instance.recipe_id
+    transaction.on_commit(lambda: pantry_index.mark_changed(recipe_id))
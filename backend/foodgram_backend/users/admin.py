@@ -5,7 +5,15 @@ from .models import Subscription, User
 
 
 class UserAdmin(BaseUserAdmin):
-    list_display = ('id', 'username', 'first_name', 'last_name', 'email')
+    list_display = (
+        'id',
+        'username',
+        'first_name',
+        'last_name',
+        'email',
+        'recipe_count',
+        'subscriber_count'
+    )
     list_filter = ('username', 'email')
     exclude = ('date_joined', 'last_login')
     fieldsets = None
@@ -0,0 +1,74 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+REVOKED_KEY = 'token_revoked:{}'
+
+
+class TokenCache:
+    """Bounded in-process LRU of token key -> Token with its user.
+
+    Entries expire after ``ttl`` seconds. Evicting a key also records the
+    revocation time in the shared cache, so other workers drop their copy
+    on the next lookup instead of waiting for the entry to expire.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        token, cached_at = entry
+        revoked_at = cache.get(REVOKED_KEY.format(key))
+        if (
+            time.time() - cached_at > self.ttl
+            or revoked_at is not None and revoked_at >= cached_at
+        ):
+            self.discard(key)
+            return None
+        return token
+
+    def set(self, key, token, loaded_at):
+        """Cache ``token`` as read from the database at ``loaded_at``.
+
+        The time must be taken before the lookup, so a revocation that
+        commits while it runs is newer than the entry and discards it.
+        """
+        with self._lock:
+            self._entries[key] = (token, loaded_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict(self, key):
+        self.discard(key)
+        cache.set(REVOKED_KEY.format(key), time.time(), self.ttl)
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            loaded_at = time.time()
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, loaded_at)
+        return copy.copy(token.user), token
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Recipes'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscriber_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Subscribers'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    first = Subscription.objects.values('author', 'subscriber').annotate(
+        first_id=Min('id')
+    ).values('first_id')
+    deleted, _ = Subscription.objects.exclude(id__in=first).delete()
+    if deleted:
+        User.objects.update(subscriber_count=Coalesce(Subquery(
+            Subscription.objects.filter(author=OuterRef('pk')).order_by()
+            .values('author').annotate(total=Count('pk')).values('total')
+        ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_subscriptions, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('author', 'subscriber'), name='unique_author_subscriber'),
+        ),
+    ]
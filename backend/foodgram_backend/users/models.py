@@ -33,6 +33,16 @@ class User(AbstractUser):
         max_length=settings.PASSWORD_LENGTH,
         verbose_name='Password'
     )
+    recipe_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Recipes'
+    )
+    subscriber_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Subscribers'
+    )
 
     class Meta:
         verbose_name = 'User'
@@ -64,3 +74,9 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = 'Subscription'
         verbose_name_plural = 'Subscriptions'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'subscriber'],
+                name='unique_author_subscriber'
+            )
+        ]
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import Subscription, User
+from core.conditional import AUTHOR_SCOPE, USER_SCOPE, bump_versions
+from recipes.counters import change_counter
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.evict(instance.key)
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, created, **kwargs):
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        token_cache.evict(key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def bump_user_versions(sender, instance, **kwargs):
+    scope = AUTHOR_SCOPE.format(instance.id)
+    transaction.on_commit(lambda: bump_versions('users', 'recipes'))
+    transaction.on_commit(
+        lambda: bump_versions(scope, using='fragments')
+    )
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_subscription_versions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_versions(
+        USER_SCOPE.format(instance.subscriber_id)
+    ))
+
+
+@receiver(post_save, sender=Subscription)
+def count_created_subscription(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'subscriber_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def count_deleted_subscription(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'subscriber_count', -1)
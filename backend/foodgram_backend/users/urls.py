@@ -24,14 +24,14 @@ subscription_urls = SubscribeViewSet.as_view({
 })
 
 urlpatterns = [
-    path('users/me/', user_me),
-    path('users/set_password/', change_password),
+    path('users/me/', user_me, name='users-me'),
+    path('users/set_password/', change_password, name='set_password'),
     path(
         'users/<int:id>/subscribe/',
         subscription_urls,
         name='subscription-detail'
     ),
     path('', include(router.urls)),
-    path('auth/token/login/', get_token),
-    path('auth/token/logout/', delete_token),
+    path('auth/token/login/', get_token, name='token-login'),
+    path('auth/token/logout/', delete_token, name='token-logout'),
 ]
@@ -1,3 +1,5 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
 from rest_framework import (
     decorators,
@@ -18,18 +20,35 @@ from api.serializers import (
     TokenSerializer,
     UserSerializer
 )
+from core.conditional import ConditionalGetMixin, conditional_response
+from core.metrics import SerializerTimingMixin
 from core.pagination import PageLimitPagination
 
 
 class UserViewSet(
+    SerializerTimingMixin,
+    ConditionalGetMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     viewsets.GenericViewSet
 ):
-    queryset = User.objects.all()
+    queryset = User.objects.order_by('id')
     serializer_class = UserSerializer
     pagination_class = PageLimitPagination
+    cursor_ordering = ('id',)
+    validator_scopes = ('users',)
+    per_user_validator = True
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return self.queryset.all()
+        return self.queryset.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(
+                author=OuterRef('pk'), subscriber=user
+            )
+        ))
 
 
 @decorators.api_view(['POST'])
@@ -56,8 +75,13 @@ def delete_token(request):
 @decorators.permission_classes([permissions.IsAuthenticated])
 def user_me(request):
     user = request.user
-    serializer = UserSerializer(user, context={'request': request})
-    return Response(serializer.data)
+    return conditional_response(
+        request,
+        ('users',),
+        lambda: Response(
+            UserSerializer(user, context={'request': request}).data
+        )
+    )
 
 
 @decorators.api_view(['POST'])
@@ -78,6 +102,7 @@ def change_password(request):
 
 
 class SubscribeViewSet(
+    SerializerTimingMixin,
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet
@@ -86,15 +111,21 @@ class SubscribeViewSet(
     serializer_class = SubscribeSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
+    @transaction.atomic
     def perform_create(self, serializer):
         author = get_object_or_404(User, id=self.kwargs.get('id'))
         if author == self.request.user:
             raise exceptions.ValidationError("You can't subscribe to yourself")
-        if Subscription.objects.filter(
-            author=author, subscriber=self.request.user
-        ):
+        try:
+            with transaction.atomic():
+                serializer.save(author=author, subscriber=self.request.user)
+        except IntegrityError:
+            # The unique constraint also catches concurrent requests.
             raise exceptions.ValidationError('You already subscribed')
-        serializer.save(author=author, subscriber=self.request.user)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
     def get_object(self):
         author = get_object_or_404(User, id=self.kwargs.get('id'))
@@ -108,12 +139,19 @@ class SubscribeViewSet(
 
 
 class SubscriptionViewSet(
+    SerializerTimingMixin,
+    ConditionalGetMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
 ):
     serializer_class = SubscriptionSerializer
     pagination_class = PageLimitPagination
+    cursor_ordering = ('id',)
     permission_classes = (permissions.IsAuthenticated,)
+    validator_scopes = ('users', 'recipes')
+    per_user_validator = True
 
     def get_queryset(self):
-        return Subscription.objects.filter(subscriber=self.request.user)
+        return Subscription.objects.filter(
+            subscriber=self.request.user
+        ).select_related('author').order_by('id')